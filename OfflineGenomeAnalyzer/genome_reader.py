@@ -1,11 +1,15 @@
 import os
 import re
+import sys
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import gzip
 
 
-@dataclass
+# slots: a genome file holds hundreds of thousands of SNPs, and chromosome
+# and genotype are already interned, so a per-instance __dict__ would be most
+# of each one's footprint
+@dataclass(slots=True)
 class GenomeData:
     """Container for personal genome data"""
     rsid: str
@@ -51,12 +55,14 @@ class GenomeReader:
                     parts = line.split('\t')
                     if len(parts) >= 4:
                         rsid = parts[0].upper()
-                        chromosome = parts[1]
+                        # Chromosomes and genotypes take a handful of values;
+                        # interning keeps one copy of each instead of one per SNP
+                        chromosome = sys.intern(parts[1])
                         position = int(parts[2]) if parts[2].isdigit() else 0
                         genotype = parts[3].upper()
                         
                         # Clean genotype (handle special cases)
-                        genotype = self._clean_genotype(genotype)
+                        genotype = sys.intern(self._clean_genotype(genotype))
                         
                         # Store the SNP data
                         if rsid.startswith('RS') or rsid.startswith('I'):
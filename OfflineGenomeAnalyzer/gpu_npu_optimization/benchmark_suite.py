@@ -272,8 +272,13 @@ class BenchmarkSuite:
         self.accuracy_validator = AccuracyValidator()
         
     def run_benchmark(self, analyzer_class, analyzer_name: str, 
-                     test_snps: int = 10000, **kwargs) -> BenchmarkResult:
-        """Run a single benchmark"""
+                     test_snps: int = 10000, parallel: bool = True,
+                     **kwargs) -> BenchmarkResult:
+        """Run a single benchmark
+        
+        parallel only applies to OptimizedParallelAnalyzer, which runs
+        inline unless asked for its process pool.
+        """
         print(f"\n{'='*50}")
         print(f"Benchmarking: {analyzer_name}")
         print(f"SNPs to analyze: {test_snps:,}")
@@ -294,8 +299,8 @@ class BenchmarkSuite:
         # Run analysis
         start_time = time.time()
         results = analyzer.analyze_parallel(limit=test_snps) if hasattr(analyzer, 'analyze_parallel') else \
-                 analyzer.analyze_all_optimized(limit=test_snps) if hasattr(analyzer, 'analyze_all_optimized') else \
-                 analyzer.analyze_max_cpu(limit=test_snps) if hasattr(analyzer, 'analyze_max_cpu') else \
+                 analyzer.analyze_all_optimized(limit=test_snps, parallel=parallel) if hasattr(analyzer, 'analyze_all_optimized') else \
+                 analyzer.analyze_all(limit=test_snps, parallel=True) if isinstance(analyzer, MaxCPUAnalyzer) else \
                  analyzer.analyze_hybrid(limit=test_snps)
         
         processing_time = time.time() - start_time
@@ -347,8 +352,12 @@ class BenchmarkSuite:
         # 1. Simple Parallel Analyzer (baseline)
         self.run_benchmark(SimpleParallelAnalyzer, "Simple Parallel", test_snps)
         
-        # 2. Optimized Parallel Analyzer
-        self.run_benchmark(OptimizedParallelAnalyzer, "Optimized Parallel", test_snps)
+        # 2. Optimized Analyzer, inline as the sequential baseline and then
+        # with its process pool
+        self.run_benchmark(OptimizedParallelAnalyzer, "Optimized Sequential", test_snps,
+                           parallel=False)
+        self.run_benchmark(OptimizedParallelAnalyzer, "Optimized Parallel", test_snps,
+                           parallel=True)
         
         # 3. Max CPU Analyzer
         self.run_benchmark(MaxCPUAnalyzer, "Max CPU", test_snps)
@@ -1,12 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
+import queue
 import os
 import json
+import pathlib
+import webbrowser
 from datetime import datetime
 
 from offline_analyzer import OfflineGenomeAnalyzer
 
+# Rows shown in the significant SNPs table; the full list still goes into
+# the exports and HTML report
+SIGNIFICANT_TABLE_ROWS = 500
+
 
 class GenomeAnalyzerGUI:
     """GUI for Offline Genome Analyzer"""
@@ -19,9 +26,17 @@ class GenomeAnalyzerGUI:
         self.analyzer = None
         self.genome_file = None
         self.results = []
+        # Per-run query results, shared by the results view and HTML report
+        self._stats = None
+        self._significant = None
+        self._medical = None
+        # Last session.json contents written or read, to skip no-op saves
+        self._last_session_blob = None
+        # (processed, total) updates from the analysis thread, drained by Tk
+        self.progress_q = queue.SimpleQueue()
+        self._analysis_running = False
         
         self.setup_ui()
-        self.load_last_session()
         
     def setup_ui(self):
         """Setup the user interface"""
@@ -73,7 +88,7 @@ class GenomeAnalyzerGUI:
         self.progress_label = ttk.Label(main_frame, text="")
         self.progress_label.grid(row=4, column=0, columnspan=3)
         
-        self.progress_bar = ttk.Progressbar(main_frame, mode='indeterminate')
+        self.progress_bar = ttk.Progressbar(main_frame, mode='determinate', maximum=100)
         self.progress_bar.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
         
         # Results section
@@ -83,9 +98,34 @@ class GenomeAnalyzerGUI:
         results_frame.rowconfigure(0, weight=1)
         main_frame.rowconfigure(6, weight=1)
         
-        # Results text area
-        self.results_text = scrolledtext.ScrolledText(results_frame, height=15, width=80)
-        self.results_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        # Results text area (summary only)
+        self.results_text = scrolledtext.ScrolledText(results_frame, height=8, width=80)
+        self.results_text.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Significant SNPs table; Treeview only draws the visible rows, so
+        # large result sets do not bloat the widget the way text does
+        columns = ('rsid', 'gt', 'mag', 'repute', 'summary')
+        self.significant_tree = ttk.Treeview(results_frame, columns=columns,
+                                             show='headings', height=10)
+        for column, heading, width in (('rsid', 'RSID', 100), ('gt', 'Genotype', 70),
+                                       ('mag', 'Magnitude', 80), ('repute', 'Repute', 80),
+                                       ('summary', 'Summary', 400)):
+            self.significant_tree.heading(column, text=heading)
+            self.significant_tree.column(column, width=width,
+                                         stretch=(column == 'summary'))
+        self.significant_tree.tag_configure('good', foreground='green')
+        self.significant_tree.tag_configure('bad', foreground='red')
+        self.significant_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(10, 0))
+        
+        tree_scroll = ttk.Scrollbar(results_frame, orient=tk.VERTICAL,
+                                    command=self.significant_tree.yview)
+        tree_scroll.grid(row=1, column=1, sticky=(tk.N, tk.S), pady=(10, 0))
+        self.significant_tree.configure(yscrollcommand=tree_scroll.set)
+        results_frame.rowconfigure(1, weight=2)
+        
+        # Configure text tags for formatting
+        self.results_text.tag_config('title', font=('Arial', 12, 'bold'))
+        self.results_text.tag_config('subtitle', font=('Arial', 10, 'bold'))
         
         # Export buttons
         export_frame = ttk.Frame(main_frame)
@@ -112,8 +152,16 @@ class GenomeAnalyzerGUI:
         
     def select_file(self):
         """Select genome file"""
+        # session.json is only read when a recent file could actually be used
+        if self.genome_file is None and self._last_session_blob is None:
+            self.load_last_session()
+        dialog_opts = {}
+        if self.genome_file:
+            dialog_opts['initialdir'] = os.path.dirname(self.genome_file)
+            dialog_opts['initialfile'] = os.path.basename(self.genome_file)
         filename = filedialog.askopenfilename(
             title="Select Genome File",
+            **dialog_opts,
             filetypes=[
                 ("Text files", "*.txt"),
                 ("Compressed files", "*.gz"),
@@ -142,10 +190,13 @@ class GenomeAnalyzerGUI:
         
         # Clear previous results
         self.results_text.delete(1.0, tk.END)
+        self.significant_tree.delete(*self.significant_tree.get_children())
         
-        # Start progress bar
-        self.progress_bar.start()
+        # Start progress bar; the worker reports counts through progress_q
+        self.progress_bar['value'] = 0
         self.progress_label.config(text="Analyzing genome...")
+        self._analysis_running = True
+        self.root.after(100, self._drain_progress)
         
         # Run analysis in separate thread
         thread = threading.Thread(target=self.run_analysis)
@@ -171,77 +222,97 @@ class GenomeAnalyzerGUI:
             
             self.results = self.analyzer.analyze_all(
                 magnitude_threshold=magnitude,
-                limit=limit
+                limit=limit,
+                progress_callback=lambda done, total: self.progress_q.put((done, total))
             )
             
-            # Get statistics
-            stats = self.analyzer.get_summary_stats()
+            # Query the results once per run; display and report reuse them
+            self._stats = self.analyzer.get_summary_stats()
+            self._significant = self.analyzer.get_significant_snps(min_magnitude=2.0)
+            self._medical = self.analyzer.get_medical_snps()
             
             # Update UI with results
-            self.root.after(0, self.display_results, stats)
+            self.root.after(0, self.display_results, self._stats, self._significant)
             
         except Exception as e:
             self.root.after(0, self.show_error, str(e))
         finally:
             self.root.after(0, self.analysis_complete)
             
+    def _drain_progress(self):
+        """Apply the latest queued progress update, then poll again"""
+        latest = None
+        while True:
+            try:
+                latest = self.progress_q.get_nowait()
+            except queue.Empty:
+                break
+        if latest:
+            done, total = latest
+            self.progress_bar['value'] = 100 * done / total if total else 100
+        if self._analysis_running:
+            self.root.after(100, self._drain_progress)
+            
     def update_progress(self, message):
         """Update progress label"""
         self.progress_label.config(text=message)
         self.status_label.config(text=message)
         
-    def display_results(self, stats):
+    def display_results(self, stats, significant):
         """Display analysis results"""
         self.results_text.delete(1.0, tk.END)
         
+        # Build the whole report first and hand it to Tk in one insert;
+        # tags are applied afterwards from the recorded character spans
+        parts = []
+        tag_spans = []
+        length = 0
+        
+        def add(text, tag=None):
+            nonlocal length
+            parts.append(text)
+            if tag:
+                tag_spans.append((tag, length, length + len(text)))
+            length += len(text)
+        
         # Summary statistics
-        self.results_text.insert(tk.END, "ANALYSIS SUMMARY\n", 'title')
-        self.results_text.insert(tk.END, "=" * 60 + "\n\n")
+        add("ANALYSIS SUMMARY\n", 'title')
+        add("=" * 60 + "\n\n")
         
-        self.results_text.insert(tk.END, f"Total SNPs analyzed: {stats['total_analyzed']}\n")
-        self.results_text.insert(tk.END, f"SNPs with SNPedia data: {stats['with_snpedia_data']}\n")
-        self.results_text.insert(tk.END, f"SNPs with magnitude: {stats['with_magnitude']}\n")
-        self.results_text.insert(tk.END, f"Significant SNPs (mag >= 2): {stats['significant']}\n")
-        self.results_text.insert(tk.END, f"Good repute: {stats['good_repute']}\n")
-        self.results_text.insert(tk.END, f"Bad repute: {stats['bad_repute']}\n\n")
+        add(f"Total SNPs analyzed: {stats['total_analyzed']}\n")
+        add(f"SNPs with SNPedia data: {stats['with_snpedia_data']}\n")
+        add(f"SNPs with magnitude: {stats['with_magnitude']}\n")
+        add(f"Significant SNPs (mag >= 2): {stats['significant']}\n")
+        add(f"Good repute: {stats['good_repute']}\n")
+        add(f"Bad repute: {stats['bad_repute']}\n\n")
         
         # Magnitude distribution
-        self.results_text.insert(tk.END, "Magnitude Distribution:\n", 'subtitle')
+        add("Magnitude Distribution:\n", 'subtitle')
         for range_key, count in stats['magnitude_distribution'].items():
-            self.results_text.insert(tk.END, f"  {range_key}: {count}\n")
+            add(f"  {range_key}: {count}\n")
+        
+        if len(significant) > SIGNIFICANT_TABLE_ROWS:
+            add(f"\nShowing top {SIGNIFICANT_TABLE_ROWS} of {len(significant)} significant SNPs\n", 'subtitle')
         
-        # Top significant SNPs
-        significant = self.analyzer.get_significant_snps(min_magnitude=2.0)
-        if significant:
-            self.results_text.insert(tk.END, "\n\nTOP SIGNIFICANT SNPS\n", 'title')
-            self.results_text.insert(tk.END, "=" * 60 + "\n\n")
+        self.results_text.insert('1.0', ''.join(parts))
+        for tag, start, end in tag_spans:
+            self.results_text.tag_add(tag, f"1.0+{start}c", f"1.0+{end}c")
             
-            for i, result in enumerate(significant[:20], 1):
-                self.results_text.insert(tk.END, f"{i}. {result.rsid} ", 'rsid')
-                self.results_text.insert(tk.END, f"({result.user_genotype})\n")
-                
-                if result.magnitude:
-                    self.results_text.insert(tk.END, f"   Magnitude: {result.magnitude}\n")
-                if result.repute:
-                    color = 'good' if 'good' in result.repute.lower() else 'bad' if 'bad' in result.repute.lower() else None
-                    self.results_text.insert(tk.END, f"   Repute: ")
-                    self.results_text.insert(tk.END, f"{result.repute}\n", color)
-                if result.summary:
-                    self.results_text.insert(tk.END, f"   Summary: {result.summary}\n")
-                if result.interpretation:
-                    self.results_text.insert(tk.END, f"   Your genotype: {result.interpretation}\n")
-                self.results_text.insert(tk.END, "\n")
-                
-        # Configure text tags for formatting
-        self.results_text.tag_config('title', font=('Arial', 12, 'bold'))
-        self.results_text.tag_config('subtitle', font=('Arial', 10, 'bold'))
-        self.results_text.tag_config('rsid', font=('Courier', 10, 'bold'), foreground='blue')
-        self.results_text.tag_config('good', foreground='green')
-        self.results_text.tag_config('bad', foreground='red')
+        # Top significant SNPs go into the table
+        self.significant_tree.delete(*self.significant_tree.get_children())
+        for result in significant[:SIGNIFICANT_TABLE_ROWS]:
+            self.significant_tree.insert('', 'end', tags=(result.repute_class,), values=(
+                result.rsid,
+                result.user_genotype,
+                result.magnitude,
+                result.repute or '',
+                result.summary or result.interpretation or ''
+            ))
         
     def analysis_complete(self):
         """Called when analysis is complete"""
-        self.progress_bar.stop()
+        self._analysis_running = False
+        self.progress_bar['value'] = 100
         self.progress_label.config(text="Analysis complete!")
         self.analyze_btn.config(state=tk.NORMAL)
         self.export_json_btn.config(state=tk.NORMAL)
@@ -252,7 +323,8 @@ class GenomeAnalyzerGUI:
     def show_error(self, error_message):
         """Show error message"""
         messagebox.showerror("Analysis Error", error_message)
-        self.progress_bar.stop()
+        self._analysis_running = False
+        self.progress_bar['value'] = 0
         self.progress_label.config(text="Error occurred")
         self.analyze_btn.config(state=tk.NORMAL)
         
@@ -293,34 +365,69 @@ class GenomeAnalyzerGUI:
         )
         
         if filename:
-            try:
-                self.create_html_report(filename)
-                messagebox.showinfo("Report Generated", f"HTML report generated:\n{filename}")
-                self.status_label.config(text=f"Report generated: {os.path.basename(filename)}")
-                
-                # Ask if user wants to open the report
-                if messagebox.askyesno("Open Report", "Do you want to open the report in your browser?"):
-                    import webbrowser
-                    webbrowser.open(f"file://{os.path.abspath(filename)}")
-            except Exception as e:
-                messagebox.showerror("Report Error", str(e))
+            # Write the report off the Tk thread so the window stays responsive
+            self.export_html_btn.config(state=tk.DISABLED)
+            self.status_label.config(text="Generating HTML report...")
+            thread = threading.Thread(target=self._html_worker, args=(filename,))
+            thread.daemon = True
+            thread.start()
+            
+    def _html_worker(self, filename):
+        """Generate the HTML report in a background thread"""
+        try:
+            self.create_html_report(filename)
+            # Resolve here rather than on the Tk thread; as_uri() also
+            # handles Windows drive letters, unlike "file://" + abspath
+            uri = pathlib.Path(filename).resolve().as_uri()
+        except Exception as e:
+            self.root.after(0, self._html_report_failed, str(e))
+        else:
+            self.root.after(0, self._html_report_done, filename, uri)
+            
+    def _html_report_done(self, filename, uri):
+        """Called on the Tk thread once the report has been written"""
+        self.export_html_btn.config(state=tk.NORMAL)
+        messagebox.showinfo("Report Generated", f"HTML report generated:\n{filename}")
+        self.status_label.config(text=f"Report generated: {os.path.basename(filename)}")
+        
+        # Ask if user wants to open the report
+        if messagebox.askyesno("Open Report", "Do you want to open the report in your browser?"):
+            webbrowser.open_new_tab(uri)
+            
+    def _html_report_failed(self, error_message):
+        """Called on the Tk thread if report generation raised"""
+        self.export_html_btn.config(state=tk.NORMAL)
+        self.status_label.config(text="Report generation failed")
+        messagebox.showerror("Report Error", error_message)
                 
     def create_html_report(self, filename):
         """Create an HTML report"""
         from html_report_generator import generate_html_report
-        generate_html_report(self.analyzer, self.results, filename)
+        generate_html_report(self.analyzer, self.results, filename,
+                             stats=self._stats,
+                             significant=self._significant,
+                             medical=self._medical)
         
     def save_session(self):
-        """Save session data"""
+        """Save session data atomically, skipping the write if unchanged"""
         session_file = "session.json"
         session_data = {
             'last_genome_file': self.genome_file
         }
+        blob = json.dumps(session_data)
+        if blob == self._last_session_blob:
+            return
+            
+        # Write to a temp file and swap it in so a crash mid-write can
+        # never leave a truncated session.json behind
+        tmp_file = session_file + ".tmp"
         try:
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-        except:
-            pass
+            with open(tmp_file, 'w') as f:
+                f.write(blob)
+            os.replace(tmp_file, session_file)
+            self._last_session_blob = blob
+        except OSError as e:
+            print(f"Could not save session: {e}")
             
     def load_last_session(self):
         """Load last session data"""
@@ -328,16 +435,17 @@ class GenomeAnalyzerGUI:
         if os.path.exists(session_file):
             try:
                 with open(session_file, 'r') as f:
-                    session_data = json.load(f)
-                    if 'last_genome_file' in session_data:
-                        last_file = session_data['last_genome_file']
-                        if os.path.exists(last_file):
-                            self.genome_file = last_file
-                            self.file_label.config(text=os.path.basename(last_file))
-                            self.analyze_btn.config(state=tk.NORMAL)
-            except:
-                pass
-
+                    blob = f.read()
+                session_data = json.loads(blob)
+                self._last_session_blob = blob
+                if isinstance(session_data, dict) and 'last_genome_file' in session_data:
+                    last_file = session_data['last_genome_file']
+                    if isinstance(last_file, str) and last_file and os.path.exists(last_file):
+                        self.genome_file = last_file
+                        self.file_label.config(text=os.path.basename(last_file))
+                        self.analyze_btn.config(state=tk.NORMAL)
+            except (OSError, ValueError) as e:
+                print(f"Could not load session: {e}")
 
 def main():
     root = tk.Tk()
@@ -1,195 +1,186 @@
+from bisect import bisect_right
 from datetime import datetime
+import heapq
 import os
-from typing import List
+from typing import Dict, List, Optional
 
 
-def generate_html_report(analyzer, results: List, filename: str):
-    """Generate a comprehensive HTML report of the genome analysis"""
-    
-    stats = analyzer.get_summary_stats()
-    significant = analyzer.get_significant_snps(min_magnitude=2.0)
-    medical = analyzer.get_medical_snps()
-    
-    html_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Genome Analysis Report - {datetime.now().strftime('%Y-%m-%d')}</title>
-    <style>
-        * {{
+# Static stylesheet, written verbatim so only the dynamic fragments of the
+# report go through f-string formatting
+_CSS = """    <style>
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
         
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
             line-height: 1.6;
             color: #333;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             min-height: 100vh;
             padding: 20px;
-        }}
+        }
         
-        .container {{
+        .container {
             max-width: 1200px;
             margin: 0 auto;
             background: white;
             border-radius: 20px;
             box-shadow: 0 20px 60px rgba(0,0,0,0.3);
             overflow: hidden;
-        }}
+        }
         
-        .header {{
+        .header {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 40px;
             text-align: center;
-        }}
+        }
         
-        .header h1 {{
+        .header h1 {
             font-size: 2.5em;
             margin-bottom: 10px;
             text-shadow: 2px 2px 4px rgba(0,0,0,0.2);
-        }}
+        }
         
-        .header .subtitle {{
+        .header .subtitle {
             font-size: 1.2em;
             opacity: 0.9;
-        }}
+        }
         
-        .content {{
+        .content {
             padding: 40px;
-        }}
+        }
         
-        .summary-grid {{
+        .summary-grid {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
             gap: 20px;
             margin-bottom: 40px;
-        }}
+        }
         
-        .stat-card {{
+        .stat-card {
             background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
             padding: 20px;
             border-radius: 15px;
             text-align: center;
             transition: transform 0.3s ease;
-        }}
+        }
         
-        .stat-card:hover {{
+        .stat-card:hover {
             transform: translateY(-5px);
-        }}
+        }
         
-        .stat-number {{
+        .stat-number {
             font-size: 2.5em;
             font-weight: bold;
             color: #667eea;
             display: block;
             margin-bottom: 5px;
-        }}
+        }
         
-        .stat-label {{
+        .stat-label {
             font-size: 0.9em;
             color: #666;
             text-transform: uppercase;
             letter-spacing: 1px;
-        }}
+        }
         
-        .section {{
+        .section {
             margin-bottom: 40px;
-        }}
+        }
         
-        .section-title {{
+        .section-title {
             font-size: 1.8em;
             color: #667eea;
             margin-bottom: 20px;
             padding-bottom: 10px;
             border-bottom: 3px solid #667eea;
-        }}
+        }
         
-        .snp-table {{
+        .snp-table {
             width: 100%;
             border-collapse: collapse;
             margin-top: 20px;
-        }}
+        }
         
-        .snp-table th {{
+        .snp-table th {
             background: #667eea;
             color: white;
             padding: 12px;
             text-align: left;
             font-weight: 600;
-        }}
+        }
         
-        .snp-table td {{
+        .snp-table td {
             padding: 12px;
             border-bottom: 1px solid #e0e0e0;
-        }}
+        }
         
-        .snp-table tr:hover {{
+        .snp-table tr:hover {
             background: #f8f9fa;
-        }}
+        }
         
-        .rsid {{
+        .rsid {
             font-family: 'Courier New', monospace;
             font-weight: bold;
             color: #2c3e50;
-        }}
+        }
         
-        .genotype {{
+        .genotype {
             font-family: 'Courier New', monospace;
             background: #e8f4fd;
             padding: 2px 6px;
             border-radius: 4px;
             color: #0066cc;
-        }}
+        }
         
-        .magnitude {{
+        .magnitude {
             font-weight: bold;
             padding: 4px 8px;
             border-radius: 4px;
             display: inline-block;
-        }}
+        }
         
-        .mag-low {{ background: #d4edda; color: #155724; }}
-        .mag-medium {{ background: #fff3cd; color: #856404; }}
-        .mag-high {{ background: #f8d7da; color: #721c24; }}
+        .mag-low { background: #d4edda; color: #155724; }
+        .mag-medium { background: #fff3cd; color: #856404; }
+        .mag-high { background: #f8d7da; color: #721c24; }
         
-        .repute-good {{ color: #28a745; font-weight: bold; }}
-        .repute-bad {{ color: #dc3545; font-weight: bold; }}
-        .repute-neutral {{ color: #6c757d; }}
+        .repute-good { color: #28a745; font-weight: bold; }
+        .repute-bad { color: #dc3545; font-weight: bold; }
+        .repute-neutral { color: #6c757d; }
         
-        .chart-container {{
+        .chart-container {
             margin: 30px 0;
             padding: 20px;
             background: #f8f9fa;
             border-radius: 10px;
-        }}
+        }
         
-        .bar-chart {{
+        .bar-chart {
             display: flex;
             align-items: flex-end;
             height: 200px;
             gap: 10px;
             margin-top: 20px;
-        }}
+        }
         
-        .bar {{
+        .bar {
             flex: 1;
             background: linear-gradient(to top, #667eea, #764ba2);
             border-radius: 5px 5px 0 0;
             position: relative;
             min-height: 20px;
             transition: opacity 0.3s ease;
-        }}
+        }
         
-        .bar:hover {{
+        .bar:hover {
             opacity: 0.8;
-        }}
+        }
         
-        .bar-label {{
+        .bar-label {
             position: absolute;
             bottom: -25px;
             left: 0;
@@ -197,9 +188,9 @@ def generate_html_report(analyzer, results: List, filename: str):
             text-align: center;
             font-size: 0.9em;
             color: #666;
-        }}
+        }
         
-        .bar-value {{
+        .bar-value {
             position: absolute;
             top: -25px;
             left: 0;
@@ -207,39 +198,105 @@ def generate_html_report(analyzer, results: List, filename: str):
             text-align: center;
             font-weight: bold;
             color: #667eea;
-        }}
+        }
         
-        .footer {{
+        .footer {
             background: #f8f9fa;
             padding: 30px;
             text-align: center;
             color: #666;
             border-top: 1px solid #e0e0e0;
-        }}
+        }
         
-        .footer p {{
+        .footer p {
             margin-bottom: 10px;
-        }}
+        }
         
-        .no-data {{
+        .no-data {
             text-align: center;
             padding: 40px;
             color: #999;
             font-style: italic;
-        }}
+        }
         
-        @media print {{
-            body {{
+        @media print {
+            body {
                 background: white;
                 padding: 0;
-            }}
-            .container {{
+            }
+            .container {
                 box-shadow: none;
                 border-radius: 0;
-            }}
-        }}
+            }
+        }
     </style>
-</head>
+"""
+
+
+_FOOTER = """        <div class="footer">
+            <p><strong>Disclaimer:</strong> This report is for educational and research purposes only.</p>
+            <p>It should not be used for medical diagnosis or treatment decisions.</p>
+            <p>Please consult with qualified healthcare professionals for medical interpretation.</p>
+            <hr style="margin: 20px 0; border: none; border-top: 1px solid #e0e0e0;">
+            <p>Generated by Offline Genome Analyzer</p>
+            <p>SNPedia data from July 2025 snapshot (CC-BY-NC-SA 3.0)</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+# Magnitude badge classes: < 2 low, < 3 medium, otherwise high
+_MAG_THRESHOLDS = (2, 3)
+_MAG_CLASSES = ('mag-low', 'mag-medium', 'mag-high')
+
+
+def _mag_class(magnitude: float) -> str:
+    """CSS class for a magnitude badge"""
+    return _MAG_CLASSES[bisect_right(_MAG_THRESHOLDS, magnitude)]
+
+
+def generate_html_report(analyzer, results: List, filename: str,
+                         stats: Optional[Dict] = None,
+                         significant: Optional[List] = None,
+                         medical: Optional[List] = None,
+                         top_n: int = 50):
+    """
+    Generate a comprehensive HTML report of the genome analysis
+    
+    stats, significant and medical may be passed in when the caller has
+    already computed them for this analysis run; otherwise they are
+    queried from the analyzer. Only the top_n rows of each table are
+    written.
+    """
+    
+    if stats is None:
+        stats = analyzer.get_summary_stats()
+    # Nothing analyzed means nothing to list; skip the SNP queries too
+    empty_report = stats['total_analyzed'] == 0
+    if significant is None:
+        significant = [] if empty_report else heapq.nlargest(
+            top_n, analyzer.iter_significant(min_magnitude=2.0),
+            key=lambda r: r.magnitude)
+    else:
+        significant = significant[:top_n]
+    if medical is None:
+        medical = [] if empty_report else analyzer.get_medical_snps(limit=top_n)
+    else:
+        medical = medical[:top_n]
+    
+    # Stream fragments straight to disk rather than growing one string
+    with open(filename, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write(f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Genome Analysis Report - {datetime.now().strftime('%Y-%m-%d')}</title>
+""")
+        f.write(_CSS)
+        f.write(f"""</head>
 <body>
     <div class="container">
         <div class="header">
@@ -248,7 +305,17 @@ def generate_html_report(analyzer, results: List, filename: str):
             <div class="subtitle">Powered by Offline SNPedia 2025 Database</div>
         </div>
         
-        <div class="content">
+""")
+        if empty_report and not significant and not medical:
+            f.write("""        <div class="content">
+            <div class="no-data">No SNPs were analyzed</div>
+        </div>
+        
+""")
+            f.write(_FOOTER)
+            return filename
+            
+        f.write(f"""        <div class="content">
             <!-- Summary Statistics -->
             <div class="section">
                 <h2 class="section-title">📊 Analysis Summary</h2>
@@ -285,20 +352,18 @@ def generate_html_report(analyzer, results: List, filename: str):
                 <h2 class="section-title">📈 Magnitude Distribution</h2>
                 <div class="chart-container">
                     <div class="bar-chart">
-"""
-    
-    # Add magnitude distribution bars
-    max_count = max(stats['magnitude_distribution'].values()) if stats['magnitude_distribution'] else 1
-    for range_key, count in stats['magnitude_distribution'].items():
-        height_percent = (count / max_count * 100) if max_count > 0 else 0
-        html_content += f"""
-                        <div class="bar" style="height: {height_percent}%;">
+""")
+        
+        # Add magnitude distribution bars
+        max_count = max(stats['magnitude_distribution'].values()) if stats['magnitude_distribution'] else 1
+        f.write(''.join(f"""
+                        <div class="bar" style="height: {(count / max_count * 100) if max_count > 0 else 0}%;">
                             <span class="bar-value">{count}</span>
                             <span class="bar-label">{range_key}</span>
                         </div>
-"""
-    
-    html_content += """
+""" for range_key, count in stats['magnitude_distribution'].items()))
+        
+        f.write("""
                     </div>
                 </div>
             </div>
@@ -306,10 +371,10 @@ def generate_html_report(analyzer, results: List, filename: str):
             <!-- Significant SNPs -->
             <div class="section">
                 <h2 class="section-title">⚠️ Significant SNPs (Magnitude ≥ 2.0)</h2>
-"""
-    
-    if significant:
-        html_content += """
+""")
+        
+        if significant:
+            f.write("""
                 <table class="snp-table">
                     <thead>
                         <tr>
@@ -321,37 +386,33 @@ def generate_html_report(analyzer, results: List, filename: str):
                         </tr>
                     </thead>
                     <tbody>
-"""
-        for snp in significant[:50]:  # Limit to top 50
-            mag_class = 'mag-low' if snp.magnitude < 2 else 'mag-medium' if snp.magnitude < 3 else 'mag-high'
-            repute_class = 'repute-good' if snp.repute and 'good' in snp.repute.lower() else 'repute-bad' if snp.repute and 'bad' in snp.repute.lower() else 'repute-neutral'
-            
-            html_content += f"""
+""")
+            f.writelines(f"""
                         <tr>
                             <td><span class="rsid">{snp.rsid}</span></td>
                             <td><span class="genotype">{snp.user_genotype}</span></td>
-                            <td><span class="magnitude {mag_class}">{snp.magnitude:.1f}</span></td>
-                            <td><span class="{repute_class}">{snp.repute or '-'}</span></td>
+                            <td><span class="magnitude {_mag_class(snp.magnitude)}">{snp.magnitude:.1f}</span></td>
+                            <td><span class="repute-{snp.repute_class}">{snp.repute or '-'}</span></td>
                             <td>{snp.summary or snp.interpretation or '-'}</td>
                         </tr>
-"""
-        html_content += """
+""" for snp in significant)
+            f.write("""
                     </tbody>
                 </table>
-"""
-    else:
-        html_content += '<div class="no-data">No significant SNPs found with magnitude ≥ 2.0</div>'
-    
-    html_content += """
+""")
+        else:
+            f.write('<div class="no-data">No significant SNPs found with magnitude ≥ 2.0</div>')
+        
+        f.write("""
             </div>
             
             <!-- Medical SNPs -->
             <div class="section">
                 <h2 class="section-title">🏥 Medical SNPs</h2>
-"""
-    
-    if medical:
-        html_content += """
+""")
+        
+        if medical:
+            f.write("""
                 <table class="snp-table">
                     <thead>
                         <tr>
@@ -363,45 +424,28 @@ def generate_html_report(analyzer, results: List, filename: str):
                         </tr>
                     </thead>
                     <tbody>
-"""
-        for snp in medical[:50]:  # Limit to top 50
-            repute_class = 'repute-good' if snp.repute and 'good' in snp.repute.lower() else 'repute-bad' if snp.repute and 'bad' in snp.repute.lower() else 'repute-neutral'
-            
-            html_content += f"""
+""")
+            f.writelines(f"""
                         <tr>
                             <td><span class="rsid">{snp.rsid}</span></td>
                             <td><span class="genotype">{snp.user_genotype}</span></td>
-                            <td><span class="{repute_class}">{snp.repute or '-'}</span></td>
+                            <td><span class="repute-{snp.repute_class}">{snp.repute or '-'}</span></td>
                             <td>{snp.summary or '-'}</td>
                             <td>{snp.interpretation or '-'}</td>
                         </tr>
-"""
-        html_content += """
+""" for snp in medical)
+            f.write("""
                     </tbody>
                 </table>
-"""
-    else:
-        html_content += '<div class="no-data">No medical SNPs with reputation data found</div>'
-    
-    html_content += """
+""")
+        else:
+            f.write('<div class="no-data">No medical SNPs with reputation data found</div>')
+        
+        f.write("""
             </div>
         </div>
         
-        <div class="footer">
-            <p><strong>Disclaimer:</strong> This report is for educational and research purposes only.</p>
-            <p>It should not be used for medical diagnosis or treatment decisions.</p>
-            <p>Please consult with qualified healthcare professionals for medical interpretation.</p>
-            <hr style="margin: 20px 0; border: none; border-top: 1px solid #e0e0e0;">
-            <p>Generated by Offline Genome Analyzer</p>
-            <p>SNPedia data from July 2025 snapshot (CC-BY-NC-SA 3.0)</p>
-        </div>
-    </div>
-</body>
-</html>
-"""
-    
-    # Write the HTML file
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+""")
+        f.write(_FOOTER)
         
     return filename
\ No newline at end of file
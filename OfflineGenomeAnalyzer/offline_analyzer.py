@@ -1,15 +1,46 @@
 import os
+import sys
+import csv
 import json
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from contextlib import closing
+from itertools import islice
+from operator import attrgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 import re
 
-from snpedia_reader import SNPediaReader, SNPInfo
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from snpedia_reader import SNPediaReader, SNPInfo, canonical_genotype
 from genome_reader import GenomeReader, GenomeData
 
 
-@dataclass
+# Summary given to genome SNPs that have no SNPedia entry
+NO_SNPEDIA_SUMMARY = "No SNPedia information available"
+
+
+def classify_repute(repute: Optional[str]) -> str:
+    """Classify a SNPedia repute as 'good', 'bad' or 'neutral'"""
+    if repute:
+        repute_lc = repute.lower()
+        if 'good' in repute_lc:
+            return 'good'
+        if 'bad' in repute_lc:
+            return 'bad'
+    return 'neutral'
+
+
+# slots: a full genome run keeps hundreds of thousands of these alive, and a
+# per-instance __dict__ roughly doubles their footprint
+@dataclass(slots=True)
 class AnalysisResult:
     """Result of analyzing a single SNP"""
     rsid: str
@@ -21,33 +52,254 @@ class AnalysisResult:
     summary: Optional[str]
     interpretation: Optional[str]
     references: List[str]
+    # Derived from repute once at construction so views don't re-lower it;
+    # not part of the exported record (see _RESULT_FIELDS)
+    repute_class: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Most results have no repute; skip the call for those
+        self.repute_class = classify_repute(self.repute) if self.repute else 'neutral'
     
     def to_dict(self):
-        return asdict(self)
+        record = {name: getattr(self, name) for name in _RESULT_FIELDS}
+        record['references'] = list(self.references)
+        return record
+
+
+def sort_by_magnitude(results: List[AnalysisResult]):
+    """
+    Sort results in place by magnitude, highest first
+    
+    Gives the same order as a stable sort on `magnitude or 0`, but only the
+    results that have a magnitude are sorted; the usually far larger rest
+    keep their order at the end.
+    """
+    rated = [r for r in results if r.magnitude]
+    rated.sort(key=attrgetter('magnitude'), reverse=True)
+    rated.extend(r for r in results if not r.magnitude)
+    results[:] = rated
+
+
+def summarize_results(results: List[AnalysisResult]) -> Dict:
+    """Get summary statistics of results in a single pass over them"""
+    with_snpedia_data = with_magnitude = significant = 0
+    good_repute = bad_repute = with_interpretation = 0
+    mag_dist = {'0-1': 0, '1-2': 0, '2-3': 0, '3-4': 0, '4+': 0}
+    
+    for r in results:
+        if r.summary != NO_SNPEDIA_SUMMARY:
+            with_snpedia_data += 1
+        if r.interpretation:
+            with_interpretation += 1
+        if r.repute:
+            repute_lc = r.repute.lower()
+            if 'good' in repute_lc:
+                good_repute += 1
+            if 'bad' in repute_lc:
+                bad_repute += 1
+                
+        magnitude = r.magnitude
+        if magnitude is not None:
+            with_magnitude += 1
+            # Magnitude distribution
+            if magnitude < 1:
+                mag_dist['0-1'] += 1
+            elif magnitude < 2:
+                mag_dist['1-2'] += 1
+            elif magnitude < 3:
+                mag_dist['2-3'] += 1
+                significant += 1
+            elif magnitude < 4:
+                mag_dist['3-4'] += 1
+                significant += 1
+            else:
+                mag_dist['4+'] += 1
+                significant += 1
+                
+    return {
+        'total_analyzed': len(results),
+        'with_snpedia_data': with_snpedia_data,
+        'with_magnitude': with_magnitude,
+        'significant': significant,
+        'good_repute': good_repute,
+        'bad_repute': bad_repute,
+        'with_interpretation': with_interpretation,
+        'magnitude_distribution': mag_dist
+    }
+
+
+# The exported record: every field set by the constructor, so derived
+# values like repute_class stay out of JSON/TSV output
+_RESULT_FIELDS = tuple(f.name for f in fields(AnalysisResult) if f.init)
+
+
+if ORJSON_AVAILABLE:
+    def _encode_record(record: Dict) -> bytes:
+        return orjson.dumps(record, default=str)
+else:
+    _json_encode = json.JSONEncoder(default=str).encode
+    
+    def _encode_record(record: Dict) -> bytes:
+        return _json_encode(record).encode('utf-8')
+
+
+class JSONResultsWriter:
+    """
+    Incrementally write results to filepath as a JSON array, one record per line
+    
+    Records are built straight from the fields rather than via asdict(),
+    which deep-copies every result. orjson is used when installed. The array
+    is closed by close(), or on leaving a with block.
+    """
+    
+    def __init__(self, filepath: str):
+        self._file = open(filepath, 'wb', buffering=1 << 20)
+        self._file.write(b'[')
+        self.count = 0
+        
+    def write(self, results: Iterable[AnalysisResult]):
+        """Append results to the array"""
+        f = self._file
+        for r in results:
+            f.write(b',\n' if self.count else b'\n')
+            f.write(_encode_record({name: getattr(r, name) for name in _RESULT_FIELDS}))
+            self.count += 1
+            
+    def close(self):
+        if not self._file.closed:
+            self._file.write(b'\n]\n')
+            self._file.close()
+            
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_results_json(results: List[AnalysisResult], filepath: str):
+    """Stream results to filepath as a JSON array, one record per line"""
+    with JSONResultsWriter(filepath) as writer:
+        writer.write(results)
+
+
+_TSV_HEADER = ("RSID", "Genotype", "Chromosome", "Position", "Magnitude",
+               "Repute", "Summary", "Interpretation", "References")
+
+
+def write_results_tsv(results: List[AnalysisResult], filepath: str):
+    """Write results to filepath as tab-separated values with a header row"""
+    with open(filepath, 'w', newline='', buffering=1 << 20) as f:
+        writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+        writer.writerow(_TSV_HEADER)
+        # csv writes None as an empty field; fields containing tabs or
+        # newlines are quoted so the columns stay aligned
+        writer.writerows(
+            (r.rsid, r.user_genotype, r.chromosome, r.position, r.magnitude,
+             r.repute, r.summary, r.interpretation, ';'.join(r.references))
+            for r in results
+        )
+
+
+# (magnitude, repute, summary, interpretation, references) for one SNPedia
+# entry and genotype, keyed by (rsid, canonical genotype); the
+# (rsid, None) key holds the entry for genotypes it does not describe
+SNPediaEntry = Tuple[Optional[float], Optional[str], Optional[str], Optional[str], List[str]]
+SNPediaCache = Dict[Tuple[str, Optional[str]], SNPediaEntry]
+
+# Per-process lookup tables for parallel analysis, set by _init_worker (or
+# inherited through fork) so batches only carry rsids
+_worker_cache: SNPediaCache = {}
+_worker_genome: Dict[str, GenomeData] = {}
+
+
+def build_snpedia_cache(snp_infos: Iterable[Tuple[str, SNPInfo]]) -> SNPediaCache:
+    """Flatten (rsid, SNPInfo) pairs into the per-genotype lookup workers use"""
+    cache = {}
+    for rsid, snp_info in snp_infos:
+        magnitude, repute, summary = snp_info.magnitude, snp_info.repute, snp_info.summary
+        references = snp_info.references
+        cache[(rsid, None)] = (magnitude, repute, summary, None, references)
+        for genotype, interpretation in snp_info.genotypes.items():
+            cache[(rsid, genotype)] = (magnitude, repute, summary, interpretation, references)
+    return cache
+
+
+def _init_worker(snpedia_cache: SNPediaCache, genome_snps: Dict[str, GenomeData]):
+    """Install the SNPedia cache and genome data in a worker process"""
+    global _worker_cache, _worker_genome
+    _worker_cache = snpedia_cache
+    _worker_genome = genome_snps
+
+
+def _analyze_batch(rsid_batch: List[str]) -> List[AnalysisResult]:
+    """Worker function: analyze a batch of genome rsids against the SNPedia cache"""
+    # Bound once; the loop body is just these lookups and the result object
+    get_entry = _worker_cache.get
+    get_genome_snp = _worker_genome.get
+    
+    results = []
+    for rsid in rsid_batch:
+        genome_snp = get_genome_snp(rsid)
+        if genome_snp is None:
+            continue
+            
+        # SNPedia fields for this exact genotype, else for the rsid alone
+        entry = (get_entry((rsid, canonical_genotype(genome_snp.genotype)))
+                 or get_entry((rsid, None)))
+        if entry is None:
+            results.append(AnalysisResult(rsid, genome_snp.genotype, genome_snp.chromosome,
+                                          genome_snp.position, None, None,
+                                          NO_SNPEDIA_SUMMARY, None, []))
+            continue
+            
+        magnitude, repute, summary, interpretation, references = entry
+        results.append(AnalysisResult(
+            rsid=rsid,
+            user_genotype=genome_snp.genotype,
+            chromosome=genome_snp.chromosome,
+            position=genome_snp.position,
+            magnitude=magnitude,
+            repute=repute,
+            summary=summary,
+            interpretation=interpretation,
+            references=references
+        ))
+    return results
 
 
 class OfflineGenomeAnalyzer:
     """Main class for offline genome analysis using pre-downloaded SNPedia data"""
     
-    def __init__(self, db_path: str = "../SNPedia2025/SNPedia2025.db"):
+    def __init__(self, db_path: str = "../SNPedia2025/SNPedia2025.db",
+                 num_processes: Optional[int] = None):
         self.snpedia_reader = SNPediaReader(db_path)
         self.genome_reader = GenomeReader()
         self.results: List[AnalysisResult] = []
+        # Worker processes for analyze_all(parallel=True)
+        self.num_processes = num_processes or mp.cpu_count()
         
     def load_genome(self, filepath: str) -> Dict:
         """Load a personal genome file"""
         self.genome_reader.read_23andme_file(filepath)
         return self.genome_reader.get_stats()
         
-    def analyze_snp(self, rsid: str) -> Optional[AnalysisResult]:
-        """Analyze a single SNP"""
+    def analyze_snp(self, rsid: str,
+                    genome_snp: Optional[GenomeData] = None) -> Optional[AnalysisResult]:
+        """Analyze a single SNP, optionally with the user's genome entry already looked up"""
         # Get user's genotype
-        genome_snp = self.genome_reader.get_snp(rsid)
+        if genome_snp is None:
+            genome_snp = self.genome_reader.get_snp(rsid)
         if not genome_snp:
             return None
             
         # Get SNPedia information
         snp_info = self.snpedia_reader.get_snp_info(rsid)
+        return self._build_result(rsid, genome_snp, snp_info)
+        
+    def _build_result(self, rsid: str, genome_snp: GenomeData,
+                      snp_info: Optional[SNPInfo]) -> AnalysisResult:
+        """Combine a genome SNP with its SNPedia entry, if any"""
         if not snp_info:
             # Even without SNPedia data, we can return basic info
             return AnalysisResult(
@@ -57,17 +309,13 @@ class OfflineGenomeAnalyzer:
                 position=genome_snp.position,
                 magnitude=None,
                 repute=None,
-                summary="No SNPedia information available",
+                summary=NO_SNPEDIA_SUMMARY,
                 interpretation=None,
                 references=[]
             )
             
-        # Find interpretation for user's genotype
-        interpretation = None
-        if genome_snp.genotype in snp_info.genotypes:
-            interpretation = snp_info.genotypes[genome_snp.genotype]
-        elif genome_snp.genotype[::-1] in snp_info.genotypes:  # Try reversed
-            interpretation = snp_info.genotypes[genome_snp.genotype[::-1]]
+        # Find interpretation for user's genotype (either allele order)
+        interpretation = snp_info.genotypes.get(canonical_genotype(genome_snp.genotype))
             
         return AnalysisResult(
             rsid=rsid,
@@ -82,23 +330,39 @@ class OfflineGenomeAnalyzer:
         )
         
     def analyze_all(self, magnitude_threshold: float = 0.0, 
-                   limit: Optional[int] = None) -> List[AnalysisResult]:
+                   limit: Optional[int] = None,
+                   progress_callback: Optional[Callable[[int, int], None]] = None,
+                   parallel: bool = False) -> List[AnalysisResult]:
         """
         Analyze all SNPs in the loaded genome
         
         Args:
             magnitude_threshold: Only include SNPs with magnitude >= this value
             limit: Maximum number of SNPs to analyze (for testing)
+            progress_callback: Called as (processed, total) every 1000 genome
+                SNPs and once more when the analysis finishes
+            parallel: Spread the genome over num_processes worker processes
         """
         self.results.clear()
         analyzed = 0
+        genome_data = self.genome_reader.genome_data
+        total = len(genome_data)
         
-        for rsid in self.genome_reader.genome_data:
-            if limit and analyzed >= limit:
-                break
-                
-            result = self.analyze_snp(rsid)
-            if result:
+        # Join the genome against SNPedia in one table scan
+        snp_infos = self.snpedia_reader.iter_snp_info(genome_data)
+        if parallel:
+            genome_results = self._iter_parallel_results(genome_data, snp_infos)
+        else:
+            genome_results = self._iter_serial_results(genome_data, snp_infos)
+            
+        with closing(genome_results):
+            for processed, result in enumerate(genome_results, 1):
+                if limit and analyzed >= limit:
+                    break
+                    
+                if progress_callback and processed % 1000 == 0:
+                    progress_callback(processed, total)
+                    
                 # Apply magnitude filter
                 if result.magnitude is None or result.magnitude >= magnitude_threshold:
                     self.results.append(result)
@@ -108,17 +372,91 @@ class OfflineGenomeAnalyzer:
                     if analyzed % 1000 == 0:
                         print(f"  Analyzed {analyzed} SNPs...")
                         
+        if progress_callback:
+            progress_callback(total, total)
+            
         # Sort by magnitude (highest first)
-        self.results.sort(key=lambda x: x.magnitude if x.magnitude else 0, reverse=True)
+        sort_by_magnitude(self.results)
         return self.results
         
-    def get_significant_snps(self, min_magnitude: float = 2.0) -> List[AnalysisResult]:
-        """Get SNPs with significant magnitude"""
-        return [r for r in self.results if r.magnitude and r.magnitude >= min_magnitude]
+    def _iter_serial_results(self, genome_data: Dict[str, GenomeData],
+                             snp_infos: Iterable[Tuple[str, SNPInfo]]) -> Iterator[AnalysisResult]:
+        """Yield a result for every genome SNP, in genome order"""
+        # Only the compact results are kept, not the parsed wiki content
+        matched = {
+            rsid: self._build_result(rsid, genome_data[rsid], snp_info)
+            for rsid, snp_info in snp_infos
+        }
+        # Most genome SNPs have no SNPedia entry, so this loop is the hot
+        # path: locals and positional AnalysisResult construction keep the
+        # per-SNP interpreter work down
+        get_matched = matched.get
+        make_result = AnalysisResult
+        no_data = NO_SNPEDIA_SUMMARY
+        for rsid, genome_snp in genome_data.items():
+            result = get_matched(rsid)
+            if result is None:
+                result = make_result(rsid, genome_snp.genotype, genome_snp.chromosome,
+                                     genome_snp.position, None, None, no_data, None, [])
+            yield result
+            
+    def _iter_parallel_results(self, genome_data: Dict[str, GenomeData],
+                               snp_infos: Iterable[Tuple[str, SNPInfo]]) -> Iterator[AnalysisResult]:
+        """Yield a result for every genome SNP, in genome order, from worker processes"""
+        snpedia_cache = build_snpedia_cache(snp_infos)
+        rsids = list(genome_data)
+        # A few large batches per worker amortize the IPC per batch; the
+        # work per SNP is uniform, so small batches buy no load balance
+        batch_size = max(1000, len(rsids) // (self.num_processes * 4))
+        batches = [rsids[i:i + batch_size] for i in range(0, len(rsids), batch_size)]
         
-    def get_medical_snps(self) -> List[AnalysisResult]:
-        """Get SNPs with medical relevance (have 'repute' field)"""
-        return [r for r in self.results if r.repute]
+        # On Linux, forked workers inherit the cache and genome data
+        # copy-on-write from the module globals; elsewhere spawn is the safe
+        # choice and each worker gets them pickled once via the initializer
+        if sys.platform.startswith('linux'):
+            _init_worker(snpedia_cache, genome_data)
+            pool_options = {'mp_context': mp.get_context('fork')}
+        else:
+            pool_options = {
+                'mp_context': mp.get_context('spawn'),
+                'initializer': _init_worker,
+                'initargs': (snpedia_cache, genome_data)
+            }
+            
+        executor = ProcessPoolExecutor(max_workers=self.num_processes, **pool_options)
+        try:
+            # Keep about two batches per worker in flight and top up as each
+            # one is read, so a limited run never queues the whole genome;
+            # reading in submission order keeps the genome order
+            pending = iter(batches)
+            in_flight = deque(executor.submit(_analyze_batch, batch)
+                              for batch in islice(pending, self.num_processes * 2))
+            while in_flight:
+                batch_results = in_flight.popleft().result()
+                for batch in islice(pending, 1):
+                    in_flight.append(executor.submit(_analyze_batch, batch))
+                yield from batch_results
+        finally:
+            # A limited run stops early; drop the batches nobody will read
+            executor.shutdown(cancel_futures=True)
+            _init_worker({}, {})
+        
+    def iter_significant(self, min_magnitude: float = 2.0) -> Iterator[AnalysisResult]:
+        """Yield SNPs with significant magnitude"""
+        return (r for r in self.results if r.magnitude and r.magnitude >= min_magnitude)
+        
+    def iter_medical(self) -> Iterator[AnalysisResult]:
+        """Yield SNPs with medical relevance (have 'repute' field)"""
+        return (r for r in self.results if r.repute)
+        
+    def get_significant_snps(self, min_magnitude: float = 2.0,
+                             limit: Optional[int] = None) -> List[AnalysisResult]:
+        """Get SNPs with significant magnitude, at most limit of them"""
+        return list(islice(self.iter_significant(min_magnitude), limit))
+        
+    def get_medical_snps(self, limit: Optional[int] = None) -> List[AnalysisResult]:
+        """Get SNPs with medical relevance (have 'repute' field), at most limit of them"""
+        return list(islice(self.iter_medical(), limit))
         
     def search_by_keyword(self, keyword: str) -> List[AnalysisResult]:
         """Search results by keyword in summary or interpretation"""
@@ -132,53 +470,13 @@ class OfflineGenomeAnalyzer:
     def export_results(self, filepath: str, format: str = 'json'):
         """Export analysis results to file"""
         if format == 'json':
-            with open(filepath, 'w') as f:
-                json.dump(
-                    [r.to_dict() for r in self.results],
-                    f,
-                    indent=2,
-                    default=str
-                )
+            write_results_json(self.results, filepath)
         elif format == 'tsv':
-            with open(filepath, 'w') as f:
-                # Header
-                f.write("RSID\tGenotype\tChromosome\tPosition\tMagnitude\tRepute\tSummary\tInterpretation\tReferences\n")
-                # Data
-                for r in self.results:
-                    refs = ';'.join(r.references) if r.references else ''
-                    f.write(f"{r.rsid}\t{r.user_genotype}\t{r.chromosome}\t{r.position}\t")
-                    f.write(f"{r.magnitude or ''}\t{r.repute or ''}\t{r.summary or ''}\t")
-                    f.write(f"{r.interpretation or ''}\t{refs}\n")
+            write_results_tsv(self.results, filepath)
                     
     def get_summary_stats(self) -> Dict:
         """Get summary statistics of the analysis"""
-        stats = {
-            'total_analyzed': len(self.results),
-            'with_snpedia_data': sum(1 for r in self.results if r.summary != "No SNPedia information available"),
-            'with_magnitude': sum(1 for r in self.results if r.magnitude is not None),
-            'significant': sum(1 for r in self.results if r.magnitude and r.magnitude >= 2.0),
-            'good_repute': sum(1 for r in self.results if r.repute and 'good' in r.repute.lower()),
-            'bad_repute': sum(1 for r in self.results if r.repute and 'bad' in r.repute.lower()),
-            'with_interpretation': sum(1 for r in self.results if r.interpretation)
-        }
-        
-        # Magnitude distribution
-        mag_dist = {'0-1': 0, '1-2': 0, '2-3': 0, '3-4': 0, '4+': 0}
-        for r in self.results:
-            if r.magnitude is not None:
-                if r.magnitude < 1:
-                    mag_dist['0-1'] += 1
-                elif r.magnitude < 2:
-                    mag_dist['1-2'] += 1
-                elif r.magnitude < 3:
-                    mag_dist['2-3'] += 1
-                elif r.magnitude < 4:
-                    mag_dist['3-4'] += 1
-                else:
-                    mag_dist['4+'] += 1
-        stats['magnitude_distribution'] = mag_dist
-        
-        return stats
+        return summarize_results(self.results)
         
     def close(self):
         """Close database connections"""
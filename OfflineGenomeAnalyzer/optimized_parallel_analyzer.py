@@ -1,111 +1,312 @@
 import os
-import json
+import sys
 import multiprocessing as mp
-from typing import Dict, List, Optional, Tuple, Callable
-from dataclasses import dataclass, asdict
+from array import array
+from itertools import islice, repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Callable
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
 import time
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import pickle
 import sqlite3
 import threading
 import queue
 import math
 
-from snpedia_reader import SNPediaReader, SNPInfo
+from snpedia_reader import SNPediaReader, SNPInfo, canonical_genotype
 from genome_reader import GenomeReader, GenomeData
-from offline_analyzer import AnalysisResult
+from offline_analyzer import (AnalysisResult, JSONResultsWriter, NO_SNPEDIA_SUMMARY,
+                              sort_by_magnitude, summarize_results,
+                              write_results_json, write_results_tsv)
 
 
-def preload_snpedia_data(db_path):
-    """Preload all SNPedia data into memory for faster access"""
-    print("Preloading SNPedia database into memory...")
-    start_time = time.time()
+@dataclass
+class SNPediaColumns:
+    """
+    Column-oriented SNPedia cache: entry i is position i of every column
     
-    snpedia_cache = {}
+    Numbers live in flat arrays instead of per-entry objects, repute strings
+    are stored once in repute_codes, and the raw wiki content is dropped, so
+    the cache is far smaller to hold and to pickle than a dict of SNPInfo.
+    A missing magnitude is NaN and a missing repute is id -1.
+    """
+    index: Dict[str, int] = field(default_factory=dict)
+    magnitude: array = field(default_factory=lambda: array('d'))
+    repute_id: array = field(default_factory=lambda: array('i'))
+    repute_codes: List[str] = field(default_factory=list)
+    summary: List[Optional[str]] = field(default_factory=list)
+    genotypes: List[Dict[str, str]] = field(default_factory=list)
+    references: List[List[str]] = field(default_factory=list)
     
-    with SNPediaReader(db_path) as reader:
-        # Get all RSIDs
-        all_rsids = reader.get_all_rsids()
-        print(f"Found {len(all_rsids):,} SNPs in database")
+    @classmethod
+    def from_snp_infos(cls, snp_infos: Iterable[SNPInfo]) -> 'SNPediaColumns':
+        """Build the columns from SNPInfo entries with unique RSIDs"""
+        columns = cls()
+        repute_ids: Dict[str, int] = {}
+        for snp_info in snp_infos:
+            columns.index[snp_info.rsid] = len(columns.summary)
+            columns.magnitude.append(math.nan if snp_info.magnitude is None else snp_info.magnitude)
+            if snp_info.repute is None:
+                columns.repute_id.append(-1)
+            else:
+                repute_id = repute_ids.get(snp_info.repute)
+                if repute_id is None:
+                    repute_id = repute_ids[snp_info.repute] = len(columns.repute_codes)
+                    columns.repute_codes.append(snp_info.repute)
+                columns.repute_id.append(repute_id)
+            columns.summary.append(snp_info.summary)
+            columns.genotypes.append(snp_info.genotypes)
+            columns.references.append(snp_info.references)
+        return columns
         
-        # Load in chunks to show progress
-        chunk_size = 10000
-        for i in range(0, len(all_rsids), chunk_size):
-            chunk = all_rsids[i:i + chunk_size]
-            for rsid in chunk:
-                snp_info = reader.get_snp_info(rsid)
-                if snp_info:
-                    snpedia_cache[rsid] = snp_info
+    def __len__(self) -> int:
+        return len(self.summary)
+
+
+# Layout version of saved cache files; bump when SNPediaColumns changes
+CACHE_FILE_VERSION = 2
+
+
+def snpedia_cache_path(db_path: str) -> str:
+    """File the preloaded cache of db_path is saved to between runs"""
+    return db_path + '.columns.pickle'
+
+
+def _database_stamp(db_path: str) -> Tuple[int, int]:
+    """(mtime, size) of the database, which a saved cache must match"""
+    stat = os.stat(db_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load_cache_file(cache_path: str, db_path: str) -> Optional[SNPediaColumns]:
+    """Load the cache saved at cache_path, or None if it is missing or stale"""
+    try:
+        with open(cache_path, 'rb') as f:
+            # A small header first, so a stale file is rejected unread
+            version, stamp = pickle.load(f)
+            if version != CACHE_FILE_VERSION or stamp != _database_stamp(db_path):
+                return None
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ignoring unreadable SNPedia cache {cache_path}: {e}")
+        return None
+
+
+def _save_cache_file(snpedia_cache: SNPediaColumns, cache_path: str, stamp: Tuple[int, int]):
+    """Save the cache to cache_path; failure only costs the next run a rebuild"""
+    # Written beside the target and renamed over it, so a concurrent run
+    # never reads a partial file
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump((CACHE_FILE_VERSION, stamp), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(snpedia_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Could not save SNPedia cache to {cache_path}: {e}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def preload_snpedia_data(db_path, cache_path: Optional[str] = None) -> SNPediaColumns:
+    """
+    Preload all SNPedia data into memory for faster access
+    
+    With cache_path, the cache is loaded from that file when it was saved
+    from the database as it is now, and otherwise built and saved there.
+    """
+    start_time = time.time()
+    if cache_path:
+        snpedia_cache = _load_cache_file(cache_path, db_path)
+        if snpedia_cache is not None:
+            print(f"Loaded {len(snpedia_cache):,} SNPs from {cache_path} "
+                  f"in {time.time() - start_time:.2f} seconds")
+            return snpedia_cache
             
-            if (i // chunk_size + 1) % 5 == 0:
-                progress = (i + chunk_size) / len(all_rsids) * 100
-                print(f"  Loaded {i + chunk_size:,}/{len(all_rsids):,} SNPs ({progress:.1f}%)")
+    print("Preloading SNPedia database into memory...")
+    # Taken before the scan, so a database changed meanwhile invalidates the file
+    stamp = _database_stamp(db_path)
+    
+    # One scan of the snps table; keyed by normalized RSID to match the
+    # genome reader's keys
+    with SNPediaReader(db_path) as reader:
+        snpedia_cache = SNPediaColumns.from_snp_infos(reader.iter_all_snp_info())
     
     load_time = time.time() - start_time
     print(f"Preloaded {len(snpedia_cache):,} SNPs in {load_time:.2f} seconds")
+    if cache_path:
+        _save_cache_file(snpedia_cache, cache_path, stamp)
     return snpedia_cache
 
 
-def analyze_snp_batch_optimized(args):
-    """
-    Optimized worker function - operates on cached data instead of database
+# SNPedia cache and the rsid and genotype of each genome SNP, as seen by a
+# worker process: inherited through fork, or unpickled once by _init_worker.
+# Workers need nothing else from a genome SNP, and two lists of strings
+# pickle far smaller and faster than a list of GenomeData objects.
+_CACHE = SNPediaColumns()
+_RSIDS: List[str] = []
+_GENOTYPES: List[str] = []
+
+
+def _set_worker_data(snpedia_cache: SNPediaColumns, rsids: List[str], genotypes: List[str]):
+    global _CACHE, _RSIDS, _GENOTYPES
+    _CACHE, _RSIDS, _GENOTYPES = snpedia_cache, rsids, genotypes
+
+
+def share_analysis_data(snpedia_cache: SNPediaColumns, rsids: List[str],
+                        genotypes: List[str]) -> shared_memory.SharedMemory:
     """
-    snpedia_cache, genome_snps_chunk, rsid_batch = args
+    Pickle the SNPedia cache and genome columns once into a new shared memory block
     
-    results = []
-    processed_count = 0
+    The caller owns the block and must close() and unlink() it.
+    """
+    blob = pickle.dumps((snpedia_cache, rsids, genotypes), protocol=pickle.HIGHEST_PROTOCOL)
+    shm = shared_memory.SharedMemory(create=True, size=len(blob))
+    shm.buf[:len(blob)] = blob
+    return shm
+
+
+def _init_worker(shm_name: str):
+    """Load the shared SNPedia cache and genome columns into this worker process"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # The block may be padded past the pickle; loads stops at its end
+        _set_worker_data(*pickle.loads(shm.buf))
+    finally:
+        shm.close()
+
+
+# Without an explicit batch size the parallel analysis sends each worker one
+# probe batch of PROBE_BATCH_SIZE SNPs, then sizes the remaining batches so
+# each takes about TARGET_BATCH_SECONDS of worker time
+PROBE_BATCH_SIZE = 1000
+TARGET_BATCH_SECONDS = 0.5
+
+# Seconds between progress reports of the parallel analysis
+PROGRESS_INTERVAL = 1.0
+
+
+def _spans(start: int, end: int, size: int) -> List[Tuple[int, int]]:
+    """Split range(start, end) into (start, end) spans of at most size"""
+    return [(i, min(i + size, end)) for i in range(start, end, size)]
+
+
+# A compact analysis row: (genome SNP index, SNPedia cache index or -1,
+# interpretation). Workers send these back instead of AnalysisResults and the
+# parent rebuilds the results from its own copies of the cache and genome.
+AnalysisRow = Tuple[int, int, Optional[str]]
+
+
+def analyze_snp_batch_optimized(span: Tuple[int, int], magnitude_threshold: float,
+                                keep_unknown: bool = True) -> Tuple[List[AnalysisRow], float]:
+    """
+    Optimized worker function - analyzes genome SNPs start to end against
+    the cached SNPedia data instead of the database
     
+    Returns the rows and the seconds spent computing them.
+    """
+    start, end = span
+    started = time.perf_counter()
     try:
-        for rsid in rsid_batch:
-            if rsid not in genome_snps_chunk:
-                continue
-                
-            genome_snp = genome_snps_chunk[rsid]
-            processed_count += 1
+        rows = _analyze_snps(_CACHE, _RSIDS, _GENOTYPES, start, end,
+                             magnitude_threshold, keep_unknown)
+    except Exception as e:
+        print(f"Error in optimized worker process: {e}")
+        rows = []
+    return rows, time.perf_counter() - started
+
+
+def _analyze_snps(cache: SNPediaColumns, rsids: List[str], genotypes: List[str],
+                  start: int, end: int, magnitude_threshold: float,
+                  keep_unknown: bool = True) -> List[AnalysisRow]:
+    """
+    Look up genome SNPs start to end, given as parallel rsids and genotypes,
+    in the cache, dropping SNPs whose known magnitude is below
+    magnitude_threshold. SNPs without a magnitude, including those SNPedia
+    does not describe, are kept only if keep_unknown is set.
+    
+    This is a few dict probes per SNP and costs a fraction of building the
+    AnalysisResults from its rows. The genotype tables map strings to
+    strings, so there is no numeric kernel here to hand to a JIT compiler.
+    """
+    rows = []
+    cache_index = cache.index.get
+    magnitudes = cache.magnitude
+    genotype_maps = cache.genotypes
+    
+    for g in range(start, end):
+        i = cache_index(rsids[g])
+        if i is None:
+            # No SNPedia data available
+            if keep_unknown:
+                rows.append((g, -1, None))
+            continue
             
-            # Get SNPedia information from cache (much faster than DB lookup)
-            snp_info = snpedia_cache.get(rsid)
-            if not snp_info:
-                # No SNPedia data available
-                result = AnalysisResult(
-                    rsid=rsid,
-                    user_genotype=genome_snp.genotype,
-                    chromosome=genome_snp.chromosome,
-                    position=genome_snp.position,
-                    magnitude=None,
-                    repute=None,
-                    summary="No SNPedia information available",
-                    interpretation=None,
-                    references=[]
-                )
-                results.append(result)
-                continue
-                
-            # Find interpretation for user's genotype
-            interpretation = None
-            if genome_snp.genotype in snp_info.genotypes:
-                interpretation = snp_info.genotypes[genome_snp.genotype]
-            elif genome_snp.genotype[::-1] in snp_info.genotypes:  # Try reversed
-                interpretation = snp_info.genotypes[genome_snp.genotype[::-1]]
-                
-            result = AnalysisResult(
-                rsid=rsid,
+        # A missing magnitude is NaN, which compares False here
+        magnitude = magnitudes[i]
+        if magnitude < magnitude_threshold or (magnitude != magnitude and not keep_unknown):
+            continue
+            
+        # Find interpretation for user's genotype; the keys are canonical,
+        # so one probe matches either orientation
+        interpretation = None
+        genotype_map = genotype_maps[i]
+        if genotype_map:
+            interpretation = genotype_map.get(canonical_genotype(genotypes[g]))
+            
+        rows.append((g, i, interpretation))
+        
+    return rows
+
+
+def _build_results(cache: SNPediaColumns, genome_snps: List[GenomeData],
+                   rows: Iterable[AnalysisRow]) -> Iterator[AnalysisResult]:
+    """Turn analysis rows back into AnalysisResults"""
+    for g, i, interpretation in rows:
+        genome_snp = genome_snps[g]
+        if i < 0:
+            yield AnalysisResult(
+                rsid=genome_snp.rsid,
                 user_genotype=genome_snp.genotype,
                 chromosome=genome_snp.chromosome,
                 position=genome_snp.position,
-                magnitude=snp_info.magnitude,
-                repute=snp_info.repute,
-                summary=snp_info.summary,
-                interpretation=interpretation,
-                references=snp_info.references
+                magnitude=None,
+                repute=None,
+                summary=NO_SNPEDIA_SUMMARY,
+                interpretation=None,
+                references=[]
             )
-            results.append(result)
+            continue
             
-    except Exception as e:
-        print(f"Error in optimized worker process: {e}")
-        return []
-        
-    return results
+        magnitude = cache.magnitude[i]
+        repute_id = cache.repute_id[i]
+        yield AnalysisResult(
+            rsid=genome_snp.rsid,
+            user_genotype=genome_snp.genotype,
+            chromosome=genome_snp.chromosome,
+            position=genome_snp.position,
+            magnitude=None if magnitude != magnitude else magnitude,  # NaN is missing
+            repute=cache.repute_codes[repute_id] if repute_id >= 0 else None,
+            summary=cache.summary[i],
+            interpretation=interpretation,
+            references=cache.references[i]
+        )
+
+
+def _add_summary_stats(totals: Dict, stats: Dict):
+    """Add the counts in summarize_results() output stats into totals"""
+    for key, value in stats.items():
+        if key == 'magnitude_distribution':
+            for bucket, count in value.items():
+                totals[key][bucket] += count
+        else:
+            totals[key] += value
 
 
 class OptimizedParallelAnalyzer:
@@ -113,19 +314,24 @@ class OptimizedParallelAnalyzer:
     
     def __init__(self, db_path: str = "../SNPedia2025/SNPedia2025.db", 
                  num_processes: Optional[int] = None,
-                 aggressive_mode: bool = True):
+                 persist_cache: bool = False):
         self.db_path = db_path
-        self.num_processes = num_processes or mp.cpu_count()
-        self.aggressive_mode = aggressive_mode
+        # Opt-in: the preloaded cache is saved beside the database and
+        # reused by later runs until the database changes. It is a pickle,
+        # so only enable this where nobody else can write next to the db
+        self.cache_path = snpedia_cache_path(db_path) if persist_cache else None
+        # One core is left for the parent, which rebuilds and collects the
+        # results; more workers than cores would only contend for them
+        self.num_processes = num_processes or max(1, mp.cpu_count() - 1)
         self.genome_reader = GenomeReader()
         self.results: List[AnalysisResult] = []
         self.snpedia_cache = None
+        # Set while an analysis streams its results to an output file
+        self._output: Optional[JSONResultsWriter] = None
+        self._streamed_stats: Optional[Dict] = None
+        self._found = 0
         
-        if aggressive_mode:
-            # Use more processes than CPU cores for I/O bound work
-            self.num_processes = min(self.num_processes * 2, 64)
-            
-        print(f"Initialized optimized analyzer with {self.num_processes} processes (aggressive: {aggressive_mode})")
+        print(f"Initialized optimized analyzer with {self.num_processes} processes")
         
     def load_genome(self, filepath: str) -> Dict:
         """Load a personal genome file"""
@@ -140,136 +346,220 @@ class OptimizedParallelAnalyzer:
     def preload_snpedia(self):
         """Preload SNPedia data into memory"""
         if self.snpedia_cache is None:
-            self.snpedia_cache = preload_snpedia_data(self.db_path)
+            self.snpedia_cache = preload_snpedia_data(self.db_path, self.cache_path)
         return self.snpedia_cache
         
     def analyze_all_optimized(self, magnitude_threshold: float = 0.0, 
                             limit: Optional[int] = None,
                             batch_size: Optional[int] = None,
-                            progress_callback: Optional[Callable] = None) -> List[AnalysisResult]:
+                            progress_callback: Optional[Callable] = None,
+                            parallel: bool = False,
+                            output_path: Optional[str] = None,
+                            keep_unknown: bool = True) -> List[AnalysisResult]:
         """
-        Highly optimized parallel analysis that maximizes CPU utilization
+        Analyze the loaded genome against the preloaded SNPedia cache.
+        
+        Each SNP costs a few dict lookups, so by default the analysis runs
+        inline in this process. parallel=True farms batches out to worker
+        processes; that only pays for its pickling and start-up cost once
+        the per-SNP analysis becomes CPU-heavy.
+        
+        SNPs without a known magnitude, most of them absent from SNPedia, are
+        kept regardless of magnitude_threshold unless keep_unknown is False.
+        
+        With output_path, results are written there as a JSON array while
+        batches complete, in completion order, instead of being kept in
+        self.results; only their summary statistics stay in memory.
         """
         self.results.clear()
+        self._streamed_stats = None
+        self._found = 0
         
         # Preload SNPedia data if not already loaded
         if self.snpedia_cache is None:
             print("First run - preloading SNPedia database...")
             self.preload_snpedia()
         
-        # Get RSIDs to analyze
-        all_rsids = list(self.genome_reader.genome_data.keys())
-        if limit:
-            all_rsids = all_rsids[:limit]
-            
-        total_snps = len(all_rsids)
-        print(f"Starting optimized analysis of {total_snps:,} SNPs using {self.num_processes} processes")
-        
-        # Calculate optimal batch size based on CPU count and data size
-        if batch_size is None:
-            # Smaller batches = better load distribution = higher CPU utilization
-            batch_size = max(50, total_snps // (self.num_processes * 4))
-            
-        print(f"Using batch size: {batch_size} SNPs per batch")
-        
-        # Convert genome data to dict for serialization
-        genome_snps = {
-            rsid: snp for rsid, snp in self.genome_reader.genome_data.items()
-            if rsid in all_rsids
-        }
-        
-        # Create many small batches for better load balancing
-        batches = []
-        for i in range(0, len(all_rsids), batch_size):
-            batch_rsids = all_rsids[i:i + batch_size]
-            batch_genome_snps = {rsid: genome_snps[rsid] for rsid in batch_rsids if rsid in genome_snps}
-            batches.append((self.snpedia_cache, batch_genome_snps, batch_rsids))
-            
-        print(f"Created {len(batches)} batches of ~{batch_size} SNPs each")
-        print(f"This should maximize CPU utilization across all {self.num_processes} cores")
-        
-        # Process batches with maximum parallelization
+        # Get SNPs to analyze
+        genome_snps = list(islice(self.genome_reader.genome_data.values(), limit or None))
+        rsids = [snp.rsid for snp in genome_snps]
+        genotypes = [snp.genotype for snp in genome_snps]
+        total_snps = len(genome_snps)
         start_time = time.time()
-        completed_batches = 0
         
+        if output_path:
+            self._output = JSONResultsWriter(output_path)
+            self._streamed_stats = summarize_results([])
         try:
-            # Use ProcessPoolExecutor with custom settings for maximum CPU usage
-            with ProcessPoolExecutor(
-                max_workers=self.num_processes,
-                mp_context=mp.get_context('spawn')  # Ensure clean process creation
-            ) as executor:
-                
-                # Submit all batches immediately to keep all cores busy
-                future_to_batch = {}
-                for i, batch in enumerate(batches):
-                    future = executor.submit(analyze_snp_batch_optimized, batch)
-                    future_to_batch[future] = i
+            if parallel:
+                print(f"Starting optimized analysis of {total_snps:,} SNPs using {self.num_processes} processes")
+                self._analyze_parallel(genome_snps, rsids, genotypes, magnitude_threshold,
+                                       keep_unknown, batch_size,
+                                       progress_callback, start_time)
+            else:
+                print(f"Starting optimized analysis of {total_snps:,} SNPs")
+                rows = _analyze_snps(self.snpedia_cache, rsids, genotypes, 0, total_snps,
+                                     magnitude_threshold, keep_unknown)
+                self._collect(_build_results(self.snpedia_cache, genome_snps, rows))
+                if progress_callback:
+                    progress_callback(f"Analyzed {total_snps:,} SNPs | Found: {self._found:,} results")
+        finally:
+            if self._output is not None:
+                self._output.close()
+                self._output = None
                 
-                print(f"Submitted {len(batches)} batches to {self.num_processes} worker processes")
-                print("All CPU cores should now be at high utilization...")
-                
-                # Collect results as they complete
-                for future in as_completed(future_to_batch):
-                    batch_idx = future_to_batch[future]
-                    try:
-                        batch_results = future.result()
-                        
-                        # Apply magnitude filter
-                        filtered_results = []
-                        for result in batch_results:
-                            if result.magnitude is None or result.magnitude >= magnitude_threshold:
-                                filtered_results.append(result)
-                                
-                        self.results.extend(filtered_results)
-                        completed_batches += 1
-                        
-                        # Progress update
-                        progress = (completed_batches / len(batches)) * 100
-                        elapsed = time.time() - start_time
-                        snps_processed = completed_batches * batch_size
-                        
-                        if snps_processed > 0 and elapsed > 0:
-                            rate = snps_processed / elapsed
-                            eta = (total_snps - snps_processed) / rate if rate > 0 else 0
-                            
-                            status = f"Completed {completed_batches}/{len(batches)} batches ({progress:.1f}%) | "
-                            status += f"Found: {len(self.results):,} results | "
-                            status += f"Rate: {rate:.0f} SNPs/sec | ETA: {eta:.0f}s"
-                            
-                            print(status)
-                            if progress_callback:
-                                progress_callback(status)
-                                
-                        # Show progress every 10% or every 100 batches
-                        if completed_batches % max(1, len(batches) // 10) == 0 or completed_batches % 100 == 0:
-                            cpu_utilization = f"Batch {completed_batches}/{len(batches)} complete"
-                            print(f"  {cpu_utilization}")
-                                
-                    except Exception as e:
-                        print(f"Error processing batch {batch_idx}: {e}")
-                        
-        except Exception as e:
-            print(f"Error in optimized parallel processing: {e}")
-            return self.results
-            
         # Sort by magnitude (highest first)
-        self.results.sort(key=lambda x: x.magnitude if x.magnitude else 0, reverse=True)
+        sort_by_magnitude(self.results)
         
         total_time = time.time() - start_time
         rate = total_snps / total_time if total_time > 0 else 0
         
         print(f"\n{'='*60}")
-        print("OPTIMIZED PARALLEL ANALYSIS COMPLETE!")
+        print("OPTIMIZED ANALYSIS COMPLETE!")
         print(f"{'='*60}")
         print(f"Total time: {total_time:.2f} seconds")
         print(f"Processing rate: {rate:.0f} SNPs/second")
-        print(f"Results found: {len(self.results):,}")
-        print(f"Theoretical speedup: {self.num_processes}x")
-        print(f"Actual speedup estimate: ~{rate / 50:.1f}x vs sequential")
-        print(f"CPU cores utilized: {self.num_processes}")
+        print(f"Results found: {self._found:,}")
+        if output_path:
+            print(f"Results written to: {output_path}")
+        if parallel:
+            print(f"Worker processes: {self.num_processes}")
         
         return self.results
         
+    def _analyze_parallel(self, genome_snps: List[GenomeData], rsids: List[str],
+                          genotypes: List[str], magnitude_threshold: float,
+                          keep_unknown: bool,
+                          batch_size: Optional[int],
+                          progress_callback: Optional[Callable],
+                          start_time: float):
+        """
+        Analyze genome_snps in worker processes, extending self.results
+        
+        rsids and genotypes are the columns of genome_snps the workers read.
+        """
+        total_snps = len(genome_snps)
+        
+        adaptive = batch_size is None
+        if adaptive:
+            # One probe batch per worker; the rest is sized once they finish
+            batch_size = max(1, min(PROBE_BATCH_SIZE, -(-total_snps // self.num_processes)))
+            batches = _spans(0, min(batch_size * self.num_processes, total_snps), batch_size)
+            print(f"Probing with {len(batches)} batches of {batch_size} SNPs")
+        else:
+            # Workers hold the genome columns already, so a batch is just a
+            # (start, end) range into them
+            batches = _spans(0, total_snps, batch_size)
+            print(f"Created {len(batches)} batches of ~{batch_size} SNPs each")
+        next_start = batches[-1][1] if batches else 0
+        snps_processed = 0
+        next_report = start_time + PROGRESS_INTERVAL
+        
+        def report(now: float):
+            progress = (snps_processed / total_snps) * 100 if total_snps else 100.0
+            elapsed = now - start_time
+            rate = snps_processed / elapsed if elapsed > 0 else 0
+            eta = (total_snps - snps_processed) / rate if rate > 0 else 0
+            
+            status = f"Processed {snps_processed:,}/{total_snps:,} SNPs ({progress:.1f}%) | "
+            status += f"Found: {self._found:,} results | "
+            status += f"Rate: {rate:.0f} SNPs/sec | ETA: {eta:.0f}s"
+            
+            print(status)
+            if progress_callback:
+                progress_callback(status)
+                
+        def record(span: Tuple[int, int], rows: List[AnalysisRow]):
+            """Collect one finished batch, reporting progress at most every PROGRESS_INTERVAL"""
+            nonlocal snps_processed, next_report
+            # Workers already dropped SNPs below the threshold
+            self._collect(_build_results(self.snpedia_cache, genome_snps, rows))
+            snps_processed += span[1] - span[0]
+            
+            now = time.time()
+            if now >= next_report:
+                report(now)
+                next_report = now + PROGRESS_INTERVAL
+                
+        # On Linux, forked workers inherit the cache and genome columns
+        # copy-on-write from the module globals and never write to them.
+        # Elsewhere spawn is the safe choice, and workers read them from
+        # shared memory once at startup rather than with every batch.
+        cache_shm = None
+        if sys.platform.startswith('linux'):
+            _set_worker_data(self.snpedia_cache, rsids, genotypes)
+            pool_options = {'mp_context': mp.get_context('fork')}
+        else:
+            cache_shm = share_analysis_data(self.snpedia_cache, rsids, genotypes)
+            pool_options = {
+                'mp_context': mp.get_context('spawn'),
+                'initializer': _init_worker,
+                'initargs': (cache_shm.name,)
+            }
+            
+        try:
+            with ProcessPoolExecutor(max_workers=self.num_processes, **pool_options) as executor:
+                if adaptive:
+                    probes = {
+                        executor.submit(analyze_snp_batch_optimized, batch,
+                                        magnitude_threshold, keep_unknown): batch
+                        for batch in batches
+                    }
+                    probe_durations = []
+                    # Read in submission order so results keep genome order,
+                    # as the serial path and the map() phase below do
+                    for future, batch in probes.items():
+                        rows, duration = future.result()
+                        probe_durations.append(duration)
+                        record(batch, rows)
+                        
+                    # Size the rest from the probe timings
+                    batch_size = self._tuned_batch_size(
+                        batch_size, probe_durations, total_snps - next_start)
+                    batches = _spans(next_start, total_snps, batch_size)
+                    print(f"Created {len(batches)} batches of ~{batch_size} SNPs each")
+                    
+                # map() sends the batches in chunks, one message per chunk
+                chunksize = max(1, len(batches) // (self.num_processes * 4))
+                outcomes = executor.map(analyze_snp_batch_optimized, batches,
+                                        repeat(magnitude_threshold), repeat(keep_unknown),
+                                        chunksize=chunksize)
+                for batch, (rows, _) in zip(batches, outcomes):
+                    record(batch, rows)
+                    
+            report(time.time())
+        except Exception as e:
+            print(f"Error in optimized parallel processing: {e}")
+        finally:
+            if cache_shm is None:
+                _set_worker_data(SNPediaColumns(), [], [])
+            else:
+                cache_shm.close()
+                cache_shm.unlink()
+        
+    def _collect(self, results: Iterable[AnalysisResult]):
+        """Keep results in self.results, or stream them to the output file"""
+        if self._output is None:
+            self.results.extend(results)
+            self._found = len(self.results)
+            return
+        batch = list(results)
+        self._output.write(batch)
+        self._found += len(batch)
+        _add_summary_stats(self._streamed_stats, summarize_results(batch))
+        
+    def _tuned_batch_size(self, probe_size: int, probe_durations: List[float],
+                          remaining: int) -> int:
+        """
+        Scale probe_size so a batch takes about TARGET_BATCH_SECONDS, keeping
+        at least one batch per worker for the remaining SNPs
+        """
+        largest = max(1, remaining // self.num_processes)
+        mean_duration = sum(probe_durations) / len(probe_durations) if probe_durations else 0
+        if mean_duration <= 0:
+            return largest
+        return max(1, min(int(probe_size * TARGET_BATCH_SECONDS / mean_duration), largest))
+        
     def get_significant_snps(self, min_magnitude: float = 2.0) -> List[AnalysisResult]:
         """Get SNPs with significant magnitude"""
         return [r for r in self.results if r.magnitude and r.magnitude >= min_magnitude]
@@ -281,51 +571,16 @@ class OptimizedParallelAnalyzer:
     def export_results(self, filepath: str, format: str = 'json'):
         """Export analysis results to file"""
         if format == 'json':
-            with open(filepath, 'w') as f:
-                json.dump(
-                    [r.to_dict() for r in self.results],
-                    f,
-                    indent=2,
-                    default=str
-                )
+            write_results_json(self.results, filepath)
         elif format == 'tsv':
-            with open(filepath, 'w') as f:
-                f.write("RSID\tGenotype\tChromosome\tPosition\tMagnitude\tRepute\tSummary\tInterpretation\tReferences\n")
-                for r in self.results:
-                    refs = ';'.join(r.references) if r.references else ''
-                    f.write(f"{r.rsid}\t{r.user_genotype}\t{r.chromosome}\t{r.position}\t")
-                    f.write(f"{r.magnitude or ''}\t{r.repute or ''}\t{r.summary or ''}\t")
-                    f.write(f"{r.interpretation or ''}\t{refs}\n")
+            write_results_tsv(self.results, filepath)
                     
     def get_summary_stats(self) -> Dict:
-        """Get summary statistics"""
-        stats = {
-            'total_analyzed': len(self.results),
-            'with_snpedia_data': sum(1 for r in self.results if r.summary != "No SNPedia information available"),
-            'with_magnitude': sum(1 for r in self.results if r.magnitude is not None),
-            'significant': sum(1 for r in self.results if r.magnitude and r.magnitude >= 2.0),
-            'good_repute': sum(1 for r in self.results if r.repute and 'good' in r.repute.lower()),
-            'bad_repute': sum(1 for r in self.results if r.repute and 'bad' in r.repute.lower()),
-            'with_interpretation': sum(1 for r in self.results if r.interpretation)
-        }
-        
-        # Magnitude distribution
-        mag_dist = {'0-1': 0, '1-2': 0, '2-3': 0, '3-4': 0, '4+': 0}
-        for r in self.results:
-            if r.magnitude is not None:
-                if r.magnitude < 1:
-                    mag_dist['0-1'] += 1
-                elif r.magnitude < 2:
-                    mag_dist['1-2'] += 1
-                elif r.magnitude < 3:
-                    mag_dist['2-3'] += 1
-                elif r.magnitude < 4:
-                    mag_dist['3-4'] += 1
-                else:
-                    mag_dist['4+'] += 1
-        stats['magnitude_distribution'] = mag_dist
-        
-        return stats
+        """Get summary statistics, including those of streamed results"""
+        if self._streamed_stats is not None:
+            return dict(self._streamed_stats,
+                        magnitude_distribution=dict(self._streamed_stats['magnitude_distribution']))
+        return summarize_results(self.results)
 
 
 def main():
@@ -338,7 +593,7 @@ def main():
     print(f"System has {cpu_count} CPU cores")
     
     # Initialize optimized analyzer
-    analyzer = OptimizedParallelAnalyzer(aggressive_mode=True)
+    analyzer = OptimizedParallelAnalyzer()
     
     # Test with actual genome file
     genome_file = "C:/Users/i_am_/Desktop/41240811505150.txt"
@@ -347,13 +602,11 @@ def main():
         genome_stats = analyzer.load_genome(genome_file)
         
         print(f"\nStarting optimized analysis...")
-        print("This should utilize all CPU cores at high percentage!")
         
         # Test with 10K SNPs first
         results = analyzer.analyze_all_optimized(
             magnitude_threshold=0.0,
-            limit=10000,
-            batch_size=100  # Small batches for maximum parallelization
+            limit=10000
         )
         
         stats = analyzer.get_summary_stats()
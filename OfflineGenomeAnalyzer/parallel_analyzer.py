@@ -1,91 +1,167 @@
 import os
-import json
+import sys
 import multiprocessing as mp
-from typing import Dict, List, Optional, Tuple, Callable
-from dataclasses import dataclass, asdict
+from typing import Dict, Iterator, List, Optional, Tuple, Union, Callable
 from datetime import datetime
 import time
 from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice, takewhile
 import sqlite3
 import threading
 import queue
 
-from snpedia_reader import SNPediaReader, SNPInfo
+from snpedia_reader import SNPediaReader, SNPInfo, canonical_genotype
 from genome_reader import GenomeReader, GenomeData
-from offline_analyzer import AnalysisResult
+from offline_analyzer import (AnalysisResult, NO_SNPEDIA_SUMMARY, sort_by_magnitude,
+                              summarize_results, write_results_json, write_results_tsv)
 
 
-def analyze_snp_batch(args):
+# Per-process state, set once per worker process so batches only carry
+# rsids: the genotype of each SNP in the analysis (inherited through fork, or
+# given to _init_worker) and one open database connection, reused by every
+# batch the worker runs. SNPedia itself is not copied into the workers; they
+# share the database file's pages through the OS page cache.
+_worker_genotypes: Dict[str, str] = {}
+_worker_reader: Optional[SNPediaReader] = None
+
+
+def _init_worker(db_path: str, genotypes: Optional[Dict[str, str]] = None):
+    """Open this worker's database connection and give it the genotypes, if not inherited"""
+    global _worker_genotypes, _worker_reader
+    if genotypes is not None:
+        _worker_genotypes = genotypes
+    # Read-only, so nothing is lost by leaving it to close when the worker exits
+    _worker_reader = SNPediaReader(db_path)
+    # Every batch scans the snps table: map up to 1 GB of it so the scans
+    # read straight from the page cache, shared by all workers. query_only
+    # guarantees the workers never take a write lock on each other.
+    _worker_reader.conn.execute("PRAGMA mmap_size = 1073741824")
+    _worker_reader.conn.execute("PRAGMA query_only = ON")
+
+
+# Default batching: enough batches per process to even out the tail of the
+# run, but none so small that the table pass per batch dominates
+BATCHES_PER_PROCESS = 8
+MIN_BATCH_SIZE = 64
+# Seconds between progress reports
+PROGRESS_INTERVAL = 1.0
+
+
+# What a worker sends back per SNP instead of a full AnalysisResult:
+# (rsid, magnitude, repute, summary, interpretation, references), or just
+# (rsid,) for a SNP SNPedia does not describe - most of a genome, so the
+# bulk of what is pickled back. The main process already has the genotype,
+# chromosome and position of each rsid.
+SNPRow = Union[Tuple[str],
+               Tuple[str, Optional[float], Optional[str], Optional[str], Optional[str], List[str]]]
+
+
+def analyze_snp_batch(rsid_batch: List[str], magnitude_threshold: float = 0.0) -> List[SNPRow]:
     """
     Worker function to analyze a batch of SNPs in parallel
     This runs in a separate process
     """
-    db_path, genome_snps, rsid_batch = args
-    
-    results = []
-    
-    # Each worker process gets its own database connection
     try:
-        with SNPediaReader(db_path) as snpedia_reader:
-            for rsid in rsid_batch:
-                if rsid not in genome_snps:
-                    continue
-                    
-                genome_snp = genome_snps[rsid]
-                
-                # Get SNPedia information
-                snp_info = snpedia_reader.get_snp_info(rsid)
-                if not snp_info:
-                    # Even without SNPedia data, we can return basic info
-                    result = AnalysisResult(
-                        rsid=rsid,
-                        user_genotype=genome_snp.genotype,
-                        chromosome=genome_snp.chromosome,
-                        position=genome_snp.position,
-                        magnitude=None,
-                        repute=None,
-                        summary="No SNPedia information available",
-                        interpretation=None,
-                        references=[]
-                    )
-                    results.append(result)
-                    continue
-                    
-                # Find interpretation for user's genotype
-                interpretation = None
-                if genome_snp.genotype in snp_info.genotypes:
-                    interpretation = snp_info.genotypes[genome_snp.genotype]
-                elif genome_snp.genotype[::-1] in snp_info.genotypes:  # Try reversed
-                    interpretation = snp_info.genotypes[genome_snp.genotype[::-1]]
-                    
-                result = AnalysisResult(
-                    rsid=rsid,
-                    user_genotype=genome_snp.genotype,
-                    chromosome=genome_snp.chromosome,
-                    position=genome_snp.position,
-                    magnitude=snp_info.magnitude,
-                    repute=snp_info.repute,
-                    summary=snp_info.summary,
-                    interpretation=interpretation,
-                    references=snp_info.references
-                )
-                results.append(result)
-                
+        return _analyze_rsids(_worker_reader, _worker_genotypes, rsid_batch, magnitude_threshold)
     except Exception as e:
         print(f"Error in worker process: {e}")
         return []
+
+
+def _analyze_rsids(snpedia_reader: SNPediaReader, genotypes: Dict[str, str],
+                   rsid_batch: List[str], magnitude_threshold: float) -> List[SNPRow]:
+    """
+    Analyze a batch of SNPs against the SNPedia database
+    
+    SNPs whose magnitude is below magnitude_threshold are dropped here, so
+    they are never sent back; SNPs without a magnitude are always kept.
+    
+    The batch's database query and the parsing of its SNPedia pages take
+    nearly all of the time; the loop matching genotypes afterwards is a few
+    dict probes per SNP on strings, with nothing for a JIT compiler to speed up.
+    """
+    rows = []
+    
+    # One query for the whole batch instead of one per SNP
+    snp_infos = snpedia_reader.get_snp_info_bulk(rsid_batch)
+    
+    for rsid in rsid_batch:
+        genotype = genotypes.get(rsid)
+        if genotype is None:
+            continue
+        
+        # Get SNPedia information
+        snp_info = snp_infos.get(rsid)
+        if not snp_info:
+            # Even without SNPedia data, we can return basic info
+            rows.append((rsid,))
+            continue
+            
+        # Magnitudes are parsed from the page text, so the database
+        # cannot filter on them; do it before any more work on the SNP
+        if snp_info.magnitude is not None and snp_info.magnitude < magnitude_threshold:
+            continue
+            
+        # Find interpretation for user's genotype: SNPedia genotypes are
+        # keyed by canonical form, so either allele order is one lookup
+        interpretation = snp_info.genotypes.get(canonical_genotype(genotype))
+        
+        rows.append((rsid, snp_info.magnitude, snp_info.repute, snp_info.summary,
+                     interpretation, snp_info.references))
+        
+    return rows
+
+
+def _build_result(genome_snp: GenomeData, row: SNPRow) -> AnalysisResult:
+    """Turn a worker row back into an AnalysisResult for genome_snp"""
+    if len(row) == 1:
+        return AnalysisResult(
+            rsid=row[0],
+            user_genotype=genome_snp.genotype,
+            chromosome=genome_snp.chromosome,
+            position=genome_snp.position,
+            magnitude=None,
+            repute=None,
+            summary=NO_SNPEDIA_SUMMARY,
+            interpretation=None,
+            references=[]
+        )
         
-    return results
+    rsid, magnitude, repute, summary, interpretation, references = row
+    if references:
+        # Workers intern PMIDs, but each batch is unpickled into fresh
+        # strings; intern them again so results of all batches share them
+        references = [sys.intern(pmid) for pmid in references]
+    return AnalysisResult(
+        rsid=rsid,
+        user_genotype=genome_snp.genotype,
+        chromosome=genome_snp.chromosome,
+        position=genome_snp.position,
+        magnitude=magnitude,
+        repute=repute,
+        summary=summary,
+        interpretation=interpretation,
+        references=references
+    )
 
 
 class ParallelGenomeAnalyzer:
     """Parallel version of the offline genome analyzer using multiprocessing"""
     
-    def __init__(self, db_path: str = "../SNPedia2025/SNPedia2025.db", num_processes: Optional[int] = None):
+    def __init__(self, db_path: str = "../SNPedia2025/SNPedia2025.db", num_processes: Optional[int] = None,
+                 start_method: Optional[str] = None):
         self.db_path = db_path
         self.num_processes = num_processes or mp.cpu_count()
+        # How worker processes are started: fork on Linux, where workers
+        # inherit the genome SNPs; elsewhere spawn is the safe choice.
+        # Programs with threads of their own (e.g. a GUI) should not fork
+        # from them and can pick 'forkserver' instead.
+        self.start_method = start_method or ('fork' if sys.platform.startswith('linux') else 'spawn')
         self.genome_reader = GenomeReader()
         self.results: List[AnalysisResult] = []
+        # Lower-cased (summary, interpretation) of each result, built by the
+        # first keyword search after an analysis; None where a field is empty
+        self._search_text: Optional[List[Tuple[Optional[str], Optional[str]]]] = None
         
         print(f"Initialized parallel analyzer with {self.num_processes} processes")
         
@@ -101,7 +177,7 @@ class ParallelGenomeAnalyzer:
         
     def analyze_all_parallel(self, magnitude_threshold: float = 0.0, 
                            limit: Optional[int] = None,
-                           batch_size: int = 1000,
+                           batch_size: Optional[int] = None,
                            progress_callback: Optional[Callable] = None) -> List[AnalysisResult]:
         """
         Analyze all SNPs in parallel using multiple processes
@@ -109,10 +185,13 @@ class ParallelGenomeAnalyzer:
         Args:
             magnitude_threshold: Only include SNPs with magnitude >= this value
             limit: Maximum number of SNPs to analyze
-            batch_size: Number of SNPs per batch (affects memory usage)
+            batch_size: Number of SNPs per batch (affects memory usage); by
+                default about 8 batches per process, so a slow batch at the
+                end holds up little of the run
             progress_callback: Function to call with progress updates
         """
         self.results.clear()
+        self._search_text = None
         
         # Get list of RSIDs to analyze
         all_rsids = list(self.genome_reader.genome_data.keys())
@@ -122,149 +201,173 @@ class ParallelGenomeAnalyzer:
         total_snps = len(all_rsids)
         print(f"Starting parallel analysis of {total_snps:,} SNPs using {self.num_processes} processes")
         
-        # Convert genome data to dict for serialization
-        genome_snps = {
-            rsid: snp for rsid, snp in self.genome_reader.genome_data.items()
-            if rsid in all_rsids
-        }
+        # The workers only need the genotypes of the SNPs being analyzed:
+        # as a plain dict of strings this pickles to a fraction of the size
+        # of the GenomeData objects, several times faster, for workers that
+        # are not forked
+        genome_data = self.genome_reader.genome_data
+        genotypes = {rsid: genome_data[rsid].genotype for rsid in all_rsids}
         
-        # Split RSIDs into batches for parallel processing
+        # Split RSIDs into batches for parallel processing. Each batch is one
+        # pass over the SNPedia table, so batches should not be tiny either
+        if not batch_size:
+            batch_size = max(MIN_BATCH_SIZE, total_snps // (self.num_processes * BATCHES_PER_PROCESS))
         batches = []
         for i in range(0, len(all_rsids), batch_size):
             batch = all_rsids[i:i + batch_size]
-            batches.append((self.db_path, genome_snps, batch))
+            batches.append(batch)
             
         print(f"Created {len(batches)} batches of ~{batch_size} SNPs each")
         
+        # With one process, or too few batches to share out, starting a pool
+        # costs more than it saves; run the batches here instead
+        inline = self.num_processes == 1 or len(batches) <= 2
+        
         # Process batches in parallel
-        start_time = time.time()
+        start_time = time.perf_counter()
         completed_batches = 0
+        snps_processed = 0
+        next_report = start_time + PROGRESS_INTERVAL
         
-        try:
-            with ProcessPoolExecutor(max_workers=self.num_processes) as executor:
-                # Submit all batches
-                future_to_batch = {executor.submit(analyze_snp_batch, batch): i 
-                                 for i, batch in enumerate(batches)}
+        def record(batch_idx: int, rows: List[SNPRow]):
+            """Collect one finished batch, reporting progress at most every PROGRESS_INTERVAL"""
+            nonlocal completed_batches, snps_processed, next_report
+            # The batch already had the magnitude filter applied
+            self.results.extend(_build_result(genome_data[row[0]], row) for row in rows)
+            completed_batches += 1
+            snps_processed += len(batches[batch_idx])
+            
+            # Progress update, at most every PROGRESS_INTERVAL seconds and
+            # once for the last batch
+            now = time.perf_counter()
+            if now >= next_report or completed_batches == len(batches):
+                next_report = now + PROGRESS_INTERVAL
+                progress = (snps_processed / total_snps) * 100
+                rate = snps_processed / (now - start_time)
+                eta = (total_snps - snps_processed) / rate if rate > 0 else 0
                 
-                # Collect results as they complete
-                for future in as_completed(future_to_batch):
-                    batch_idx = future_to_batch[future]
-                    try:
-                        batch_results = future.result()
-                        
-                        # Apply magnitude filter
-                        filtered_results = []
-                        for result in batch_results:
-                            if result.magnitude is None or result.magnitude >= magnitude_threshold:
-                                filtered_results.append(result)
-                                
-                        self.results.extend(filtered_results)
-                        completed_batches += 1
-                        
-                        # Progress update
-                        progress = (completed_batches / len(batches)) * 100
-                        elapsed = time.time() - start_time
-                        snps_processed = completed_batches * batch_size
-                        if snps_processed > 0:
-                            rate = snps_processed / elapsed
-                            eta = (total_snps - snps_processed) / rate if rate > 0 else 0
-                            
-                            status = f"Processed {completed_batches}/{len(batches)} batches ({progress:.1f}%) - "
-                            status += f"{len(self.results):,} results found - "
-                            status += f"Rate: {rate:.0f} SNPs/sec - ETA: {eta:.0f}s"
-                            
-                            print(status)
-                            if progress_callback:
-                                progress_callback(status)
-                                
-                    except Exception as e:
-                        print(f"Error processing batch {batch_idx}: {e}")
-                        
+                status = f"Processed {completed_batches}/{len(batches)} batches ({progress:.1f}%) - "
+                status += f"{len(self.results):,} results found - "
+                status += f"Rate: {rate:.0f} SNPs/sec - ETA: {eta:.0f}s"
+                
+                print(status)
+                if progress_callback:
+                    progress_callback(status)
+                    
+        try:
+            if inline:
+                self._analyze_inline(batches, genotypes, magnitude_threshold, record)
+            else:
+                self._analyze_in_pool(batches, genotypes, magnitude_threshold, record)
         except Exception as e:
             print(f"Error in parallel processing: {e}")
+            sort_by_magnitude(self.results)
             return self.results
             
         # Sort by magnitude (highest first)
-        self.results.sort(key=lambda x: x.magnitude if x.magnitude else 0, reverse=True)
+        sort_by_magnitude(self.results)
         
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         rate = total_snps / total_time if total_time > 0 else 0
         
         print(f"\nParallel analysis complete!")
         print(f"  Total time: {total_time:.2f} seconds")
         print(f"  Processing rate: {rate:.0f} SNPs/second")
         print(f"  Results found: {len(self.results):,}")
-        print(f"  Speedup estimate: ~{self.num_processes}x faster than sequential")
+        print(f"  Speedup estimate: ~{1 if inline else self.num_processes}x faster than sequential")
         
         return self.results
         
-    def get_significant_snps(self, min_magnitude: float = 2.0) -> List[AnalysisResult]:
-        """Get SNPs with significant magnitude"""
-        return [r for r in self.results if r.magnitude and r.magnitude >= min_magnitude]
+    def _analyze_inline(self, batches: List[List[str]], genotypes: Dict[str, str],
+                        magnitude_threshold: float, record: Callable):
+        """Analyze batches one after another in this process, passing each to record"""
+        with SNPediaReader(self.db_path) as snpedia_reader:
+            for batch_idx, batch in enumerate(batches):
+                try:
+                    record(batch_idx, _analyze_rsids(snpedia_reader, genotypes, batch,
+                                                     magnitude_threshold))
+                except Exception as e:
+                    print(f"Error processing batch {batch_idx}: {e}")
+                    
+    def _analyze_in_pool(self, batches: List[List[str]], genotypes: Dict[str, str],
+                         magnitude_threshold: float, record: Callable):
+        """Analyze batches in worker processes, passing each to record as it completes"""
+        # The genotypes reach each worker once, not with every batch, and
+        # each worker keeps one database connection for all of them. Forked
+        # workers inherit the genotypes copy-on-write from the module
+        # global; otherwise each worker gets them pickled once via the
+        # initializer. Connections are never inherited: each worker opens
+        # its own.
+        global _worker_genotypes
+        if self.start_method == 'fork':
+            _worker_genotypes = genotypes
+            initargs = (self.db_path,)
+        else:
+            initargs = (self.db_path, genotypes)
+            
+        try:
+            with ProcessPoolExecutor(max_workers=self.num_processes,
+                                     mp_context=mp.get_context(self.start_method),
+                                     initializer=_init_worker,
+                                     initargs=initargs) as executor:
+                # Submit all batches
+                future_to_batch = {executor.submit(analyze_snp_batch, batch, magnitude_threshold): i 
+                                 for i, batch in enumerate(batches)}
+                
+                # Collect results as they complete
+                for future in as_completed(future_to_batch):
+                    batch_idx = future_to_batch[future]
+                    try:
+                        record(batch_idx, future.result())
+                    except Exception as e:
+                        print(f"Error processing batch {batch_idx}: {e}")
+        finally:
+            _worker_genotypes = {}
+        
+    def iter_significant(self, min_magnitude: float = 2.0) -> Iterator[AnalysisResult]:
+        """Yield SNPs with significant magnitude"""
+        # Results are sorted by magnitude, highest first, so the significant
+        # ones are a prefix and the scan can stop at the first that is not
+        return takewhile(lambda r: r.magnitude and r.magnitude >= min_magnitude, self.results)
+        
+    def iter_medical(self) -> Iterator[AnalysisResult]:
+        """Yield SNPs with medical relevance (have 'repute' field)"""
+        return (r for r in self.results if r.repute)
+        
+    def get_significant_snps(self, min_magnitude: float = 2.0,
+                             limit: Optional[int] = None) -> List[AnalysisResult]:
+        """Get SNPs with significant magnitude, at most limit of them"""
+        return list(islice(self.iter_significant(min_magnitude), limit))
         
-    def get_medical_snps(self) -> List[AnalysisResult]:
-        """Get SNPs with medical relevance (have 'repute' field)"""
-        return [r for r in self.results if r.repute]
+    def get_medical_snps(self, limit: Optional[int] = None) -> List[AnalysisResult]:
+        """Get SNPs with medical relevance (have 'repute' field), at most limit of them"""
+        return list(islice(self.iter_medical(), limit))
         
     def search_by_keyword(self, keyword: str) -> List[AnalysisResult]:
         """Search results by keyword in summary or interpretation"""
         keyword = keyword.lower()
+        if self._search_text is None:
+            self._search_text = [
+                (r.summary.lower() if r.summary else None,
+                 r.interpretation.lower() if r.interpretation else None)
+                for r in self.results
+            ]
         return [
-            r for r in self.results
-            if (r.summary and keyword in r.summary.lower()) or
-               (r.interpretation and keyword in r.interpretation.lower())
+            r for r, (summary, interpretation) in zip(self.results, self._search_text)
+            if (summary is not None and keyword in summary) or
+               (interpretation is not None and keyword in interpretation)
         ]
         
     def export_results(self, filepath: str, format: str = 'json'):
         """Export analysis results to file"""
         if format == 'json':
-            with open(filepath, 'w') as f:
-                json.dump(
-                    [r.to_dict() for r in self.results],
-                    f,
-                    indent=2,
-                    default=str
-                )
+            write_results_json(self.results, filepath)
         elif format == 'tsv':
-            with open(filepath, 'w') as f:
-                # Header
-                f.write("RSID\tGenotype\tChromosome\tPosition\tMagnitude\tRepute\tSummary\tInterpretation\tReferences\n")
-                # Data
-                for r in self.results:
-                    refs = ';'.join(r.references) if r.references else ''
-                    f.write(f"{r.rsid}\t{r.user_genotype}\t{r.chromosome}\t{r.position}\t")
-                    f.write(f"{r.magnitude or ''}\t{r.repute or ''}\t{r.summary or ''}\t")
-                    f.write(f"{r.interpretation or ''}\t{refs}\n")
+            write_results_tsv(self.results, filepath)
                     
     def get_summary_stats(self) -> Dict:
         """Get summary statistics of the analysis"""
-        stats = {
-            'total_analyzed': len(self.results),
-            'with_snpedia_data': sum(1 for r in self.results if r.summary != "No SNPedia information available"),
-            'with_magnitude': sum(1 for r in self.results if r.magnitude is not None),
-            'significant': sum(1 for r in self.results if r.magnitude and r.magnitude >= 2.0),
-            'good_repute': sum(1 for r in self.results if r.repute and 'good' in r.repute.lower()),
-            'bad_repute': sum(1 for r in self.results if r.repute and 'bad' in r.repute.lower()),
-            'with_interpretation': sum(1 for r in self.results if r.interpretation)
-        }
-        
-        # Magnitude distribution
-        mag_dist = {'0-1': 0, '1-2': 0, '2-3': 0, '3-4': 0, '4+': 0}
-        for r in self.results:
-            if r.magnitude is not None:
-                if r.magnitude < 1:
-                    mag_dist['0-1'] += 1
-                elif r.magnitude < 2:
-                    mag_dist['1-2'] += 1
-                elif r.magnitude < 3:
-                    mag_dist['2-3'] += 1
-                elif r.magnitude < 4:
-                    mag_dist['3-4'] += 1
-                else:
-                    mag_dist['4+'] += 1
-        stats['magnitude_distribution'] = mag_dist
-        
-        return stats
+        return summarize_results(self.results)
 
 
 def main():
@@ -349,8 +452,6 @@ def main():
 
 
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) > 1:
         # Use command line argument as genome file
         genome_file = sys.argv[1]
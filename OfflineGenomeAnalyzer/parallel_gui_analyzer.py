@@ -1,13 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
+import queue
 import os
+import sys
 import json
 import multiprocessing as mp
 from datetime import datetime
 
 from parallel_analyzer import ParallelGenomeAnalyzer
 
+# Tk runs threads in this process, so workers must not be forked from it.
+# On Linux a fork server, started once with the analyzer already imported,
+# forks them instead; elsewhere the analyzer uses spawn.
+START_METHOD = 'forkserver' if sys.platform.startswith('linux') else None
+
 
 class ParallelGenomeAnalyzerGUI:
     """GUI for Parallel Offline Genome Analyzer - Much Faster!"""
@@ -20,7 +27,16 @@ class ParallelGenomeAnalyzerGUI:
         self.analyzer = None
         self.genome_file = None
         self.results = []
+        # Per-run query results, shared by the results view and HTML report
+        self._stats = None
+        self._significant = None
+        self._medical = None
+        # Last session.json contents written or read, to skip no-op saves
+        self._last_session_blob = None
         self.cpu_count = mp.cpu_count()
+        # Status lines from the analysis thread, drained by Tk
+        self.progress_q = queue.SimpleQueue()
+        self._analysis_running = False
         
         self.setup_ui()
         self.load_last_session()
@@ -80,11 +96,11 @@ class ParallelGenomeAnalyzerGUI:
         cores_spin.grid(row=1, column=1, sticky=tk.W, padx=5)
         
         ttk.Label(options_frame, text="Batch Size:").grid(row=1, column=2, sticky=tk.W, padx=(20, 0))
-        self.batch_var = tk.IntVar(value=1000)
-        batch_spin = ttk.Spinbox(options_frame, from_=100, to=10000, increment=500,
+        self.batch_var = tk.IntVar(value=0)
+        batch_spin = ttk.Spinbox(options_frame, from_=0, to=10000, increment=500,
                                 textvariable=self.batch_var, width=10)
         batch_spin.grid(row=1, column=3, sticky=tk.W, padx=5)
-        ttk.Label(options_frame, text="(SNPs per batch)").grid(row=1, column=4, sticky=tk.W)
+        ttk.Label(options_frame, text="(SNPs per batch, 0 = auto)").grid(row=1, column=4, sticky=tk.W)
         
         # Quick analysis presets
         presets_frame = ttk.LabelFrame(main_frame, text="Quick Analysis Presets", padding="10")
@@ -126,6 +142,13 @@ class ParallelGenomeAnalyzerGUI:
         self.results_text = scrolledtext.ScrolledText(results_frame, height=15, width=80)
         self.results_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
+        # Configure text tags for formatting
+        self.results_text.tag_config('title', font=('Arial', 12, 'bold'))
+        self.results_text.tag_config('subtitle', font=('Arial', 10, 'bold'))
+        self.results_text.tag_config('rsid', font=('Courier', 10, 'bold'), foreground='blue')
+        self.results_text.tag_config('good', foreground='green')
+        self.results_text.tag_config('bad', foreground='red')
+        
         # Export buttons
         export_frame = ttk.Frame(main_frame)
         export_frame.grid(row=10, column=0, columnspan=3, pady=10)
@@ -190,8 +213,10 @@ class ParallelGenomeAnalyzerGUI:
         self.results_text.delete(1.0, tk.END)
         self.progress_bar.config(value=0)
         
-        # Start progress bar
+        # Start progress bar; the analysis reports its status through progress_q
         self.progress_label.config(text="Initializing parallel analysis...")
+        self._analysis_running = True
+        self.root.after(100, self._drain_progress)
         
         # Run analysis in separate thread
         thread = threading.Thread(target=self.run_analysis)
@@ -203,7 +228,8 @@ class ParallelGenomeAnalyzerGUI:
         try:
             # Initialize parallel analyzer
             num_processes = self.cores_var.get()
-            self.analyzer = ParallelGenomeAnalyzer(num_processes=num_processes)
+            self.analyzer = ParallelGenomeAnalyzer(num_processes=num_processes,
+                                                   start_method=START_METHOD)
             
             # Load genome
             self.root.after(0, self.update_progress, "Loading genome file...", 0)
@@ -216,41 +242,50 @@ class ParallelGenomeAnalyzerGUI:
             self.root.after(0, self.update_progress, 
                           f"Loaded {total_snps:,} SNPs. Starting parallel analysis of {analyze_count:,} SNPs...", 10)
             
-            # Progress callback function
-            def progress_callback(status):
-                # Extract progress percentage from status if possible
-                try:
-                    if "%" in status:
-                        percent_str = status.split("(")[1].split("%")[0]
-                        percent = float(percent_str)
-                        self.root.after(0, self.update_progress, status, 10 + (percent * 0.8))
-                    else:
-                        self.root.after(0, self.update_progress, status, None)
-                except:
-                    self.root.after(0, self.update_progress, status, None)
-            
             # Run parallel analysis
             magnitude = self.magnitude_var.get()
-            batch_size = self.batch_var.get()
+            # 0 lets the analyzer size batches from the SNP and core counts
+            batch_size = self.batch_var.get() or None
             
             self.results = self.analyzer.analyze_all_parallel(
                 magnitude_threshold=magnitude,
                 limit=limit,
                 batch_size=batch_size,
-                progress_callback=progress_callback
+                progress_callback=self.progress_q.put
             )
             
-            # Get statistics
-            stats = self.analyzer.get_summary_stats()
+            # Query the results once per run, here rather than on the Tk
+            # thread; display and report reuse them
+            self._stats = self.analyzer.get_summary_stats()
+            self._significant = self.analyzer.get_significant_snps(min_magnitude=2.0)
+            self._medical = self.analyzer.get_medical_snps()
             
             # Update UI with results
-            self.root.after(0, self.display_results, stats)
+            self.root.after(0, self.display_results, self._stats, self._significant, self._medical)
             
         except Exception as e:
             self.root.after(0, self.show_error, str(e))
         finally:
             self.root.after(0, self.analysis_complete)
             
+    def _drain_progress(self):
+        """Apply the latest queued status line, then poll again while analyzing"""
+        latest = None
+        while True:
+            try:
+                latest = self.progress_q.get_nowait()
+            except queue.Empty:
+                break
+        if latest:
+            # Extract progress percentage from status if possible
+            try:
+                percent = 10 + float(latest.split("(")[1].split("%")[0]) * 0.8
+            except (IndexError, ValueError):
+                percent = None
+            self.update_progress(latest, percent)
+        if self._analysis_running:
+            self.root.after(100, self._drain_progress)
+            
     def update_progress(self, message, percent=None):
         """Update progress label and bar"""
         self.progress_label.config(text=message)
@@ -262,77 +297,83 @@ class ParallelGenomeAnalyzerGUI:
         if "Rate:" in message and "SNPs/sec" in message:
             self.perf_label.config(text=message.split("Rate:")[1].split("-")[0].strip())
         
-    def display_results(self, stats):
+    def display_results(self, stats, significant, medical):
         """Display analysis results"""
         self.results_text.delete(1.0, tk.END)
         
+        # Build the whole report first and hand it to Tk in one insert of
+        # alternating text and tag arguments, so the widget lays out once.
+        # Repute is tagged with its class; only 'good' and 'bad' are styled.
+        # The report lists at most the top 20 significant and top 10 medical
+        # SNPs, so it stays the same size however many results there are;
+        # the full set goes to the exports and HTML report instead.
+        chunks = []
+        
+        def add(text, tag=None):
+            chunks.append(text)
+            chunks.append(tag or '')
+        
         # Performance summary
-        self.results_text.insert(tk.END, "🚀 PARALLEL ANALYSIS COMPLETE\n", 'title')
-        self.results_text.insert(tk.END, "=" * 60 + "\n\n")
+        add("🚀 PARALLEL ANALYSIS COMPLETE\n", 'title')
+        add("=" * 60 + "\n\n")
         
         # Summary statistics
-        self.results_text.insert(tk.END, "📊 ANALYSIS SUMMARY\n", 'title')
-        self.results_text.insert(tk.END, "=" * 40 + "\n\n")
+        add("📊 ANALYSIS SUMMARY\n", 'title')
+        add("=" * 40 + "\n\n")
         
-        self.results_text.insert(tk.END, f"Total SNPs analyzed: {stats['total_analyzed']:,}\n")
-        self.results_text.insert(tk.END, f"SNPs with SNPedia data: {stats['with_snpedia_data']:,}\n")
-        self.results_text.insert(tk.END, f"SNPs with magnitude: {stats['with_magnitude']:,}\n")
-        self.results_text.insert(tk.END, f"Significant SNPs (mag >= 2): {stats['significant']:,}\n")
-        self.results_text.insert(tk.END, f"Good repute: {stats['good_repute']:,}\n")
-        self.results_text.insert(tk.END, f"Bad repute: {stats['bad_repute']:,}\n")
-        self.results_text.insert(tk.END, f"With interpretation: {stats['with_interpretation']:,}\n\n")
+        add(f"Total SNPs analyzed: {stats['total_analyzed']:,}\n")
+        add(f"SNPs with SNPedia data: {stats['with_snpedia_data']:,}\n")
+        add(f"SNPs with magnitude: {stats['with_magnitude']:,}\n")
+        add(f"Significant SNPs (mag >= 2): {stats['significant']:,}\n")
+        add(f"Good repute: {stats['good_repute']:,}\n")
+        add(f"Bad repute: {stats['bad_repute']:,}\n")
+        add(f"With interpretation: {stats['with_interpretation']:,}\n\n")
         
         # Magnitude distribution
-        self.results_text.insert(tk.END, "📈 Magnitude Distribution:\n", 'subtitle')
+        add("📈 Magnitude Distribution:\n", 'subtitle')
         for range_key, count in stats['magnitude_distribution'].items():
-            self.results_text.insert(tk.END, f"  {range_key}: {count:,}\n")
+            add(f"  {range_key}: {count:,}\n")
         
         # Top significant SNPs
-        significant = self.analyzer.get_significant_snps(min_magnitude=2.0)
         if significant:
-            self.results_text.insert(tk.END, "\n⚠️  TOP SIGNIFICANT SNPs (Magnitude >= 2.0)\n", 'title')
-            self.results_text.insert(tk.END, "=" * 50 + "\n\n")
+            add("\n⚠️  TOP SIGNIFICANT SNPs (Magnitude >= 2.0)\n", 'title')
+            add("=" * 50 + "\n\n")
             
             for i, result in enumerate(significant[:20], 1):
-                self.results_text.insert(tk.END, f"{i}. {result.rsid} ", 'rsid')
-                self.results_text.insert(tk.END, f"({result.user_genotype})\n")
+                add(f"{i}. {result.rsid} ", 'rsid')
+                add(f"({result.user_genotype})\n")
                 
                 if result.magnitude:
-                    self.results_text.insert(tk.END, f"   🔥 Magnitude: {result.magnitude}\n")
+                    add(f"   🔥 Magnitude: {result.magnitude}\n")
                 if result.repute:
-                    color = 'good' if 'good' in result.repute.lower() else 'bad' if 'bad' in result.repute.lower() else None
-                    self.results_text.insert(tk.END, f"   📋 Repute: ")
-                    self.results_text.insert(tk.END, f"{result.repute}\n", color)
+                    add(f"   📋 Repute: ")
+                    add(f"{result.repute}\n", result.repute_class)
                 if result.summary:
-                    self.results_text.insert(tk.END, f"   📝 Summary: {result.summary}\n")
+                    add(f"   📝 Summary: {result.summary}\n")
                 if result.interpretation:
-                    self.results_text.insert(tk.END, f"   🧬 Your genotype: {result.interpretation}\n")
-                self.results_text.insert(tk.END, "\n")
+                    add(f"   🧬 Your genotype: {result.interpretation}\n")
+                add("\n")
                 
         # Medical SNPs
-        medical = self.analyzer.get_medical_snps()
         if medical:
-            self.results_text.insert(tk.END, f"\n🏥 MEDICAL SNPs ({len(medical):,} found)\n", 'title')
-            self.results_text.insert(tk.END, "=" * 30 + "\n\n")
+            add(f"\n🏥 MEDICAL SNPs ({len(medical):,} found)\n", 'title')
+            add("=" * 30 + "\n\n")
             
             for i, result in enumerate(medical[:10], 1):
-                self.results_text.insert(tk.END, f"{i}. {result.rsid} ", 'rsid')
-                self.results_text.insert(tk.END, f"({result.user_genotype}) - ")
-                color = 'good' if result.repute and 'good' in result.repute.lower() else 'bad' if result.repute and 'bad' in result.repute.lower() else None
-                self.results_text.insert(tk.END, f"{result.repute}\n", color)
+                add(f"{i}. {result.rsid} ", 'rsid')
+                add(f"({result.user_genotype}) - ")
+                add(f"{result.repute}\n", result.repute_class)
                 if result.summary:
-                    self.results_text.insert(tk.END, f"   {result.summary}\n")
-                self.results_text.insert(tk.END, "\n")
+                    add(f"   {result.summary}\n")
+                add("\n")
                 
-        # Configure text tags for formatting
-        self.results_text.tag_config('title', font=('Arial', 12, 'bold'))
-        self.results_text.tag_config('subtitle', font=('Arial', 10, 'bold'))
-        self.results_text.tag_config('rsid', font=('Courier', 10, 'bold'), foreground='blue')
-        self.results_text.tag_config('good', foreground='green')
-        self.results_text.tag_config('bad', foreground='red')
+        self.results_text.insert(tk.END, *chunks)
         
     def analysis_complete(self):
         """Called when analysis is complete"""
+        # Stop polling, applying whatever status is still queued
+        self._analysis_running = False
+        self._drain_progress()
         self.progress_bar.config(value=100)
         self.progress_label.config(text="🎉 Parallel analysis complete!")
         self.analyze_btn.config(state=tk.NORMAL)
@@ -344,6 +385,7 @@ class ParallelGenomeAnalyzerGUI:
     def show_error(self, error_message):
         """Show error message"""
         messagebox.showerror("Analysis Error", error_message)
+        self._analysis_running = False
         self.progress_bar.config(value=0)
         self.progress_label.config(text="❌ Error occurred")
         self.analyze_btn.config(state=tk.NORMAL)
@@ -359,24 +401,45 @@ class ParallelGenomeAnalyzerGUI:
         if format == 'json':
             filename = filedialog.asksaveasfilename(
                 defaultextension=".json",
-                initialname=f"parallel_analysis_{timestamp}.json",
+                initialfile=f"parallel_analysis_{timestamp}.json",
                 filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
             )
         else:  # tsv
             filename = filedialog.asksaveasfilename(
                 defaultextension=".tsv",
-                initialname=f"parallel_analysis_{timestamp}.tsv",
+                initialfile=f"parallel_analysis_{timestamp}.tsv",
                 filetypes=[("Tab-separated files", "*.tsv"), ("All files", "*.*")]
             )
             
         if filename:
-            try:
-                self.analyzer.export_results(filename, format=format)
-                messagebox.showinfo("Export Complete", f"Results exported to:\n{filename}")
-                self.status_label.config(text=f"📁 Exported to {os.path.basename(filename)}")
-            except Exception as e:
-                messagebox.showerror("Export Error", str(e))
-                
+            # Write the file off the Tk thread so the window stays responsive
+            self.export_json_btn.config(state=tk.DISABLED)
+            self.export_tsv_btn.config(state=tk.DISABLED)
+            self.status_label.config(text=f"Exporting {len(self.results):,} results...")
+            thread = threading.Thread(target=self._export_worker, args=(filename, format))
+            thread.daemon = True
+            thread.start()
+            
+    def _export_worker(self, filename, format):
+        """Export the results in a background thread"""
+        try:
+            self.analyzer.export_results(filename, format=format)
+        except Exception as e:
+            self.root.after(0, self._export_finished, filename, str(e))
+        else:
+            self.root.after(0, self._export_finished, filename, None)
+            
+    def _export_finished(self, filename, error_message):
+        """Called on the Tk thread once an export has been written or has failed"""
+        self.export_json_btn.config(state=tk.NORMAL)
+        self.export_tsv_btn.config(state=tk.NORMAL)
+        if error_message:
+            self.status_label.config(text="Export failed")
+            messagebox.showerror("Export Error", error_message)
+        else:
+            messagebox.showinfo("Export Complete", f"Results exported to:\n{filename}")
+            self.status_label.config(text=f"📁 Exported to {os.path.basename(filename)}")
+            
     def generate_html_report(self):
         """Generate HTML report"""
         if not self.results:
@@ -386,14 +449,17 @@ class ParallelGenomeAnalyzerGUI:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = filedialog.asksaveasfilename(
             defaultextension=".html",
-            initialname=f"parallel_genome_report_{timestamp}.html",
+            initialfile=f"parallel_genome_report_{timestamp}.html",
             filetypes=[("HTML files", "*.html"), ("All files", "*.*")]
         )
         
         if filename:
             try:
                 from html_report_generator import generate_html_report
-                generate_html_report(self.analyzer, self.results, filename)
+                generate_html_report(self.analyzer, self.results, filename,
+                                     stats=self._stats,
+                                     significant=self._significant,
+                                     medical=self._medical)
                 messagebox.showinfo("Report Generated", f"HTML report generated:\n{filename}")
                 self.status_label.config(text=f"📄 Report generated: {os.path.basename(filename)}")
                 
@@ -405,7 +471,7 @@ class ParallelGenomeAnalyzerGUI:
                 messagebox.showerror("Report Error", str(e))
                 
     def save_session(self):
-        """Save session data"""
+        """Save session data atomically, skipping the write if unchanged"""
         session_file = "session.json"
         session_data = {
             'last_genome_file': self.genome_file,
@@ -414,11 +480,20 @@ class ParallelGenomeAnalyzerGUI:
             'last_cores': self.cores_var.get(),
             'last_batch': self.batch_var.get()
         }
+        blob = json.dumps(session_data)
+        if blob == self._last_session_blob:
+            return
+            
+        # Write to a temp file and swap it in so a crash mid-write can
+        # never leave a truncated session.json behind
+        tmp_file = session_file + ".tmp"
         try:
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-        except:
-            pass
+            with open(tmp_file, 'w') as f:
+                f.write(blob)
+            os.replace(tmp_file, session_file)
+            self._last_session_blob = blob
+        except OSError as e:
+            print(f"Could not save session: {e}")
             
     def load_last_session(self):
         """Load last session data"""
@@ -426,31 +501,35 @@ class ParallelGenomeAnalyzerGUI:
         if os.path.exists(session_file):
             try:
                 with open(session_file, 'r') as f:
-                    session_data = json.load(f)
-                    if 'last_genome_file' in session_data:
-                        last_file = session_data['last_genome_file']
-                        if os.path.exists(last_file):
-                            self.genome_file = last_file
-                            self.file_label.config(text=os.path.basename(last_file))
-                            self.analyze_btn.config(state=tk.NORMAL)
-                    
-                    # Restore settings
-                    if 'last_magnitude' in session_data:
-                        self.magnitude_var.set(session_data['last_magnitude'])
-                    if 'last_limit' in session_data:
-                        self.limit_var.set(session_data['last_limit'])
-                    if 'last_cores' in session_data:
-                        self.cores_var.set(session_data['last_cores'])
-                    if 'last_batch' in session_data:
-                        self.batch_var.set(session_data['last_batch'])
-            except:
-                pass
+                    blob = f.read()
+                session_data = json.loads(blob)
+                self._last_session_blob = blob
+                if not isinstance(session_data, dict):
+                    return
+                if 'last_genome_file' in session_data:
+                    last_file = session_data['last_genome_file']
+                    if isinstance(last_file, str) and last_file and os.path.exists(last_file):
+                        self.genome_file = last_file
+                        self.file_label.config(text=os.path.basename(last_file))
+                        self.analyze_btn.config(state=tk.NORMAL)
+                
+                # Restore settings
+                if 'last_magnitude' in session_data:
+                    self.magnitude_var.set(session_data['last_magnitude'])
+                if 'last_limit' in session_data:
+                    self.limit_var.set(session_data['last_limit'])
+                if 'last_cores' in session_data:
+                    self.cores_var.set(session_data['last_cores'])
+                if 'last_batch' in session_data:
+                    self.batch_var.set(session_data['last_batch'])
+            except (OSError, ValueError) as e:
+                print(f"Could not load session: {e}")
 
 
 def main():
-    # Check if multiprocessing is properly configured
-    mp.set_start_method('spawn', force=True)
-    
+    if START_METHOD == 'forkserver':
+        mp.set_forkserver_preload(['parallel_analyzer'])
+        
     root = tk.Tk()
     app = ParallelGenomeAnalyzerGUI(root)
     root.mainloop()
@@ -14,10 +14,14 @@ def monitor_cpu_usage(duration=30):
     start_time = time.time()
     max_cpu = 0
     max_active = 0
+    # Prime the per-core counters; each later sample covers the time since
+    # the previous one, and the overall figure is their mean
+    psutil.cpu_percent(interval=None, percpu=True)
     
     while time.time() - start_time < duration:
-        cpu_percent = psutil.cpu_percent(interval=1)
-        per_core = psutil.cpu_percent(interval=0, percpu=True)
+        time.sleep(1)
+        per_core = psutil.cpu_percent(interval=None, percpu=True)
+        cpu_percent = sum(per_core) / len(per_core)
         active_cores = sum(1 for usage in per_core if usage > 10)
         
         elapsed = time.time() - start_time
@@ -64,10 +68,13 @@ def test_cpu_utilization():
     
     def cpu_monitor():
         nonlocal max_cpu, max_active
+        # One per-core sample per tick, as in monitor_cpu_usage
+        psutil.cpu_percent(interval=None, percpu=True)
         while not stop_monitor.is_set():
             try:
-                cpu = psutil.cpu_percent(interval=0.5)
-                cores = psutil.cpu_percent(interval=0, percpu=True)
+                time.sleep(0.5)
+                cores = psutil.cpu_percent(interval=None, percpu=True)
+                cpu = sum(cores) / len(cores)
                 active = sum(1 for usage in cores if usage > 15)
                 
                 max_cpu = max(max_cpu, cpu)
@@ -1,7 +1,9 @@
 import sqlite3
 import os
 import re
-from typing import Dict, List, Optional, Tuple
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 import json
 
@@ -10,7 +12,7 @@ import json
 class SNPInfo:
     """Data class for SNP information"""
     rsid: str
-    genotypes: Dict[str, str]
+    genotypes: Dict[str, str]  # keyed by canonical_genotype()
     magnitude: Optional[float]
     summary: Optional[str]
     repute: Optional[str]
@@ -18,6 +20,24 @@ class SNPInfo:
     raw_content: str
 
 
+# Bounded: lookups pass a small set of genome genotypes, but parsing also
+# passes whatever allele text the database holds
+@lru_cache(maxsize=1024)
+def canonical_genotype(genotype: str) -> str:
+    """
+    Order-independent, uppercase form of a two-allele genotype ('ga' -> 'AG')
+    
+    SNPInfo.genotypes is keyed by this form, so a single lookup matches a
+    genotype and its reverse. Anything other than two single-character
+    alleles (e.g. multi-base insertions) is returned unchanged, since
+    sorting its characters could make distinct genotypes collide.
+    """
+    if len(genotype) != 2:
+        return genotype
+    first, second = genotype.upper()
+    return first + second if first <= second else second + first
+
+
 class SNPediaReader:
     """Reads SNP information from the offline SNPedia2025 database"""
     
@@ -27,6 +47,11 @@ class SNPediaReader:
         if not os.path.exists(self.db_path):
             raise FileNotFoundError(f"Database not found at {self.db_path}")
         self.conn = sqlite3.connect(self.db_path)
+        # Whole-table scans dominate; let SQLite map the file and keep a
+        # large page cache instead of issuing small reads
+        self.conn.execute("PRAGMA mmap_size = 268435456")
+        self.conn.execute("PRAGMA cache_size = -262144")
+        self.conn.execute("PRAGMA temp_store = MEMORY")
         self.cursor = self.conn.cursor()
         
     def __enter__(self):
@@ -40,11 +65,17 @@ class SNPediaReader:
         if self.conn:
             self.conn.close()
             
-    def get_snp_raw(self, rsid: str) -> Optional[str]:
-        """Get raw wiki content for a specific SNP"""
+    @staticmethod
+    def _normalize_rsid(rsid: str) -> str:
+        """Uppercase an RSID and add the RS prefix if it is missing"""
         rsid = rsid.upper()
         if not rsid.startswith('RS') and not rsid.startswith('I'):
             rsid = 'RS' + rsid
+        return rsid
+        
+    def get_snp_raw(self, rsid: str) -> Optional[str]:
+        """Get raw wiki content for a specific SNP"""
+        rsid = self._normalize_rsid(rsid)
             
         self.cursor.execute("SELECT content FROM snps WHERE UPPER(rsid) = ?", (rsid,))
         result = self.cursor.fetchone()
@@ -65,7 +96,7 @@ class SNPediaReader:
         genotype_matches = re.findall(genotype_pattern, content)
         for match in genotype_matches:
             if len(match) >= 3:
-                genotype = match[1] + match[2]
+                genotype = canonical_genotype(match[1] + match[2])
                 info['genotypes'][genotype] = match[3] if len(match) > 3 else ''
         
         # Extract magnitude
@@ -89,9 +120,10 @@ class SNPediaReader:
         if summary_match:
             info['summary'] = summary_match.group(1).strip()
             
-        # Extract PMID references
+        # Extract PMID references; interned because many SNPs cite the same
+        # papers, so results share one string per PMID (and pickle it once)
         pmid_pattern = r'PMID[:\s]*(\d+)'
-        info['references'] = re.findall(pmid_pattern, content)
+        info['references'] = [sys.intern(pmid) for pmid in re.findall(pmid_pattern, content)]
         
         return info
         
@@ -100,7 +132,76 @@ class SNPediaReader:
         raw_content = self.get_snp_raw(rsid)
         if not raw_content:
             return None
+        return self._build_snp_info(rsid, raw_content)
+        
+    def get_snp_info_bulk(self, rsids: Iterable[str]) -> Dict[str, SNPInfo]:
+        """
+        Get parsed SNP information for many RSIDs with a single query
+        
+        Returns a dict keyed by normalized RSID, without the RSIDs that are
+        not in the database. As with get_snp_info, the first matching row
+        wins. The RSIDs are passed as one JSON array rather than one
+        parameter each, so any number fits in the query.
+        """
+        wanted = {self._normalize_rsid(rsid) for rsid in rsids}
+        if not wanted:
+            return {}
             
+        query = ("SELECT rsid, content FROM snps "
+                 "WHERE UPPER(rsid) IN (SELECT value FROM json_each(?))")
+        seen = set()
+        snp_infos = {}
+        for rsid, raw_content in self.conn.execute(query, (json.dumps(list(wanted)),)):
+            rsid = rsid.upper()
+            if rsid in seen:
+                continue
+            seen.add(rsid)
+            if raw_content:
+                snp_infos[rsid] = self._build_snp_info(rsid, raw_content)
+        return snp_infos
+        
+    def iter_snp_info(self, rsids: Iterable[str]) -> Iterator[Tuple[str, SNPInfo]]:
+        """
+        Yield (rsid, SNPInfo) for each of the given RSIDs found in the database
+        
+        The snps table is scanned once and joined against the requested set,
+        instead of issuing one UPPER(rsid) query (a full scan) per RSID.
+        Returned RSIDs are normalized the same way get_snp_raw does.
+        """
+        wanted = {self._normalize_rsid(rsid) for rsid in rsids}
+        for rsid, raw_content in self.conn.execute("SELECT rsid, content FROM snps"):
+            if not wanted:
+                break
+            if rsid is None:
+                continue
+            rsid = rsid.upper()
+            if rsid not in wanted:
+                continue
+            # First row wins, as with fetchone() in get_snp_raw
+            wanted.discard(rsid)
+            if raw_content:
+                yield rsid, self._build_snp_info(rsid, raw_content)
+                
+    def iter_all_snp_info(self) -> Iterator[SNPInfo]:
+        """
+        Yield a parsed SNPInfo for every entry in the database, in one scan
+        
+        SNPInfo.rsid is the normalized (uppercase) RSID; when several rows
+        normalize to the same RSID only the first is yielded.
+        """
+        seen = set()
+        for rsid, raw_content in self.conn.execute("SELECT rsid, content FROM snps"):
+            if rsid is None:
+                continue
+            rsid = self._normalize_rsid(rsid)
+            if rsid in seen:
+                continue
+            seen.add(rsid)
+            if raw_content:
+                yield self._build_snp_info(rsid, raw_content)
+                
+    def _build_snp_info(self, rsid: str, raw_content: str) -> SNPInfo:
+        """Parse raw wiki content into an SNPInfo"""
         parsed = self.parse_snp_content(raw_content)
         return SNPInfo(
             rsid=rsid.upper(),